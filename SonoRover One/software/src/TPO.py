@@ -33,9 +33,18 @@ https://github.com/Donders-Institute/Radboud-FUS-measurement-kit
 import serial
 import time
 from psychopy import gui
-import numpy as np
 import sys
 import re
+import logging
+from collections import Counter
+
+from tpoCommunication import decodeAck
+
+# ends-with-digits check for the com port, compiled once
+_COM_RE = re.compile(r'\d+$')
+
+# start command of the TPO
+_START = b'START\r'
 
 class USProtocol:
     def __init__(self):
@@ -47,45 +56,50 @@ class USProtocol:
         self.focus = 40000                       # Focus in um
 
     def convertToOkData(self):
-        ok_data = np.empty(6,dtype=object)
-
-        ok_data = [self.driving_system_com_port,
-                   self.pulse_dur / 1000,
-                   self.pulse_rep_int / 1000,
-                   self.pulse_train_dur / 1e6,
-                   self.global_power,
-                   self.focus / 1000]
-
-        return ok_data
+        return (self.driving_system_com_port,
+                self.pulse_dur / 1000,
+                self.pulse_rep_int / 1000,
+                self.pulse_train_dur / 1e6,
+                self.global_power,
+                self.focus / 1000)
 
 def setInputParameters(ok_data, color_field_num = 0, text = ' '):
-    dialog = gui.Dlg(title="Set US protocol parameters")
-    dialog.addText(text)
-    dialog.addField('COM port of US driving system*:', ok_data[0], color=checkFieldColor(color_field_num, 1))
-    dialog.addField('Pulse duration [ms]*:', ok_data[1], color=checkFieldColor(color_field_num, 2))
-    dialog.addField('Pulse repetition interval [ms]*:', ok_data[2], color=checkFieldColor(color_field_num, 3))
-    dialog.addField('Pulse train duration [s]*:', ok_data[3], color=checkFieldColor(color_field_num, 4))
-    dialog.addField('Global power [mW]*:', ok_data[4], color=checkFieldColor(color_field_num, 5))
-    dialog.addField('Focus [mm]*:', ok_data[5], color=checkFieldColor(color_field_num, 6))
-
-    ok_data = dialog.show()
-    
-    if dialog.OK:
-        ok_data = checkValues(ok_data)
-
-        usProt.driving_system_com_port = ok_data[0]
-        usProt.pulse_dur = ok_data[1] * 1000
-        usProt.pulse_rep_int = ok_data[2] * 1000
-        usProt.pulse_train_dur = ok_data[3] * 1e6
-        usProt.global_power = ok_data[4]
-        usProt.focus = ok_data[5] * 1000
+    # Show the dialog until all values are correct
+    while True:
+        dialog = gui.Dlg(title="Set US protocol parameters")
+        dialog.addText(text)
+        dialog.addField('COM port of US driving system*:', ok_data[0], color=checkFieldColor(color_field_num, 1))
+        dialog.addField('Pulse duration [ms]*:', ok_data[1], color=checkFieldColor(color_field_num, 2))
+        dialog.addField('Pulse repetition interval [ms]*:', ok_data[2], color=checkFieldColor(color_field_num, 3))
+        dialog.addField('Pulse train duration [s]*:', ok_data[3], color=checkFieldColor(color_field_num, 4))
+        dialog.addField('Global power [mW]*:', ok_data[4], color=checkFieldColor(color_field_num, 5))
+        dialog.addField('Focus [mm]*:', ok_data[5], color=checkFieldColor(color_field_num, 6))
+
+        ok_data = dialog.show()
+
+        if not dialog.OK:
+            # Pipeline is cancelled by user
+            sys.exit("Pipeline is cancelled by user.")
+
+        errors = checkValues(ok_data)
+        if not errors:
+            break
+
+        # Color the first incorrect field and show all error messages at once
+        color_field_num = errors[0][0]
+        text = '\n'.join(error[1] for error in errors)
+
+    usProt.driving_system_com_port = ok_data[0]
+    usProt.pulse_dur = ok_data[1] * 1000
+    usProt.pulse_rep_int = ok_data[2] * 1000
+    usProt.pulse_train_dur = ok_data[3] * 1e6
+    usProt.global_power = ok_data[4]
+    usProt.focus = ok_data[5] * 1000
 
-        return ok_data
-    else:
-        # Pipeline is cancelled by user
-        sys.exit("Pipeline is cancelled by user.")
+    return ok_data
 
 def checkValues(ok_data):
+        """ return a list of (field number, error message) for all incorrect values """
         driving_system_com_port = ok_data[0]
         pulse_dur = ok_data[1]
         pulse_rep_int = ok_data[2]
@@ -93,32 +107,27 @@ def checkValues(ok_data):
         global_power = ok_data[4]
         focus = ok_data[5]
 
-        match_result = re.search(r'\d+$', driving_system_com_port)
+        errors = []
+
         # Check if tpo com port is correctly written
-        if not driving_system_com_port.startswith('COM'):
-            # Redo until tpo com port is correct
-            ok_data = setInputParameters(ok_data, 1, text = 'Error: Com port must start with COM. Please change value.')
+        if driving_system_com_port[:3] != 'COM':
+            errors.append((1, 'Error: Com port must start with COM. Please change value.'))
         # if the string ends in digits, match will be a Match object, or None otherwise.
-        elif match_result is None:
-            # Redo until tpo com port is correct
-            ok_data = setInputParameters(ok_data, 1, text = 'Error: Com port must end with a number. Please change value.')
-
-        # Check if pulse duration is a number
-        ok_data = checkIfNumAndPos(pulse_dur, True, ok_data, 2, 'pulse duration')
-
-        # Check if pulse repetition interval is a number
-        ok_data = checkIfNumAndPos(pulse_rep_int, True, ok_data, 3, 'pulse repetition interval')
-
-        # Check if pulse train duration is a number
-        ok_data = checkIfNumAndPos(pulse_train_dur, True, ok_data, 4, 'pulse train duration')
-
-        # Check if global power is a number
-        ok_data = checkIfNumAndPos(global_power, True, ok_data, 5, 'global power')
-
-        # Check if focus is a number
-        ok_data = checkIfNumAndPos(focus, True, ok_data, 6, 'focus')
-
-        return ok_data
+        elif _COM_RE.search(driving_system_com_port) is None:
+            errors.append((1, 'Error: Com port must end with a number. Please change value.'))
+
+        # Check if pulse duration, pulse repetition interval, pulse train duration, global power
+        # and focus are positive numbers
+        for field_num, parameter, par_name in [(2, pulse_dur, 'pulse duration'),
+                                               (3, pulse_rep_int, 'pulse repetition interval'),
+                                               (4, pulse_train_dur, 'pulse train duration'),
+                                               (5, global_power, 'global power'),
+                                               (6, focus, 'focus')]:
+            error = checkIfNumAndPos(parameter, True, par_name)
+            if error is not None:
+                errors.append((field_num, error))
+
+        return errors
 
 def checkFieldColor(color_field_num, field_num):
     if color_field_num == field_num:
@@ -127,61 +136,61 @@ def checkFieldColor(color_field_num, field_num):
         color = ''
     return color
 
-def checkIfNumAndPos(parameter, check_pos, ok_data, color_field_num, par_name):
+def checkIfNumAndPos(parameter, check_pos, par_name):
+    """ return an error message if the parameter is not a (positive) number, None otherwise """
     # Check if input is float
     try:
         parameter = float(parameter)
-        if check_pos:
-            if parameter < 0:
-                # Redo until input is correct
-                ok_data = setInputParameters(ok_data, color_field_num = color_field_num, text = f'Error: {par_name} cannot be a negative value. Please change value.')
-    except:
-        # Redo until input is correct
-        ok_data = setInputParameters(ok_data, color_field_num = color_field_num, text = f'Error: value of {par_name} is not a number or contains a comma as decimal separator. Please change value or decimal separator.')
+    except (TypeError, ValueError):
+        return f'Error: value of {par_name} is not a number or contains a comma as decimal separator. Please change value or decimal separator.'
 
-    return ok_data
+    if check_pos and parameter < 0:
+        return f'Error: {par_name} cannot be a negative value. Please change value.'
+
+    return None
 
 if __name__ == '__main__':
 
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger('TPO')
+
     usProt = USProtocol()
     setInputParameters(usProt.convertToOkData())
 
     with serial.Serial(usProt.driving_system_com_port, 115200, timeout=1) as ser:
+    		# Reduce the driver latency where supported (Linux only)
+    		if hasattr(ser, 'set_low_latency_mode'):
+    			try:
+    				ser.set_low_latency_mode(True)
+    			except (IOError, ValueError):
+    				pass
     		time.sleep(1)
-    		line = ser.readline().decode("ascii")
-    		print(f'connect: {line}')
-    		cmd=f'BURST={usProt.pulse_dur}\r'
-    		nb=ser.write(cmd.encode('ascii'))
-    		time.sleep(1)
-    		line = ser.readline().decode("ascii")
-    		print(f'connect: {line}')
-    		cmd=f'PERIOD={usProt.pulse_rep_int}\r'
+    		line = decodeAck(ser.readline())
+    		logger.info('connect: %s', line)
+    		# Send all settings at once, the port timeout bounds each response
+    		settings = [('BURST', usProt.pulse_dur),
+    		            ('PERIOD', usProt.pulse_rep_int),
+    		            ('TIMER', usProt.pulse_train_dur),
+    		            ('GLOBALPOWER', usProt.global_power),
+    		            ('FOCUS', usProt.focus)]
+    		cmd = "".join(f'{key}={value}\r' for key, value in settings)
     		nb=ser.write(cmd.encode('ascii'))
+    		for key, _ in settings:
+    			line = decodeAck(ser.readline())
+    			logger.info('%s: %s', key, line)
     		time.sleep(1)
-    		line = ser.readline().decode("ascii").rstrip()
-    		print(f'PERIOD: {line}')
-    		cmd=f'TIMER={usProt.pulse_train_dur}\r'
-    		nb=ser.write(cmd.encode('ascii'))
-    		time.sleep(1)
-    		line = ser.readline().decode("ascii").rstrip()
-    		print(f'TIMER: {line}')
-    		cmd=f'GLOBALPOWER={usProt.global_power}\r'
-    		nb=ser.write(cmd.encode('ascii'))
-    		time.sleep(1)
-    		line = ser.readline().decode("ascii")
-    		print(f'GLOBALPOWER: {line}')
-    		cmd=f'FOCUS={usProt.focus}\r'
-    		nb=ser.write(cmd.encode('ascii'))
-    		time.sleep(1)
-    		line = ser.readline().decode("ascii")
-    		print(f'FOCUS: {line}')
-    		time.sleep(1)
+    		acks = []
     		for i in range(1000):
-     			cmd='START\r'
-     			nb=ser.write(cmd.encode('ascii'))
-     			time.sleep(0.5)
-     			line = ser.readline().decode("ascii")
-     			print(f'PERIOD: {line}')
+     			nb=ser.write(_START)
+     			# readline returns on the acknowledgement or after the port timeout
+     			acks.append(decodeAck(ser.readline()))
+
+    		# Report all acknowledgements in one line, with the count per distinct response, so
+    		# missing (empty) or unexpected responses stand out
+    		counts = Counter(acks)
+    		missing = counts.pop('', 0)
+    		logger.info('START: %d shots, %d without response, responses: %s', len(acks), missing,
+    		            ', '.join(f'{count} x {line!r}' for line, count in counts.most_common()))
     
     #		cmd=f'ABORT\r'
     #		nb=ser.write(cmd.encode('ascii'))
@@ -46,15 +46,15 @@ import os.path
 from os import getcwd
 import time
 import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import cmath
 import math
 import serial
 
 import json
 import tpoCommunication as tpoCom
 from psychopy import gui
-import csv
 from datetime import datetime
 
 from scan_iter import Scan_Iter
@@ -68,6 +68,153 @@ import unifus
 import configparser
 import transducerXYZ
 
+try:  # optional, speeds up reading of coordinate files
+    import pyarrow
+except ImportError:
+    pyarrow = None
+try:  # optional, compiles the phasor calculation
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+try:  # optional, much faster excel reader than openpyxl
+    import python_calamine
+except ImportError:
+    python_calamine = None
+try:  # optional, evaluates exp(iwt) in chunks on multiple threads
+    import numexpr
+except ImportError:
+    numexpr = None
+
+# columns of a coordinate file used during the scan
+COORD_COLUMNS = ["Measurement number", "Cluster number", "Indices number", "X-coordinate [mm]",
+                 "Y-coordinate [mm]", "Z-coordinate [mm]", "Row number", "Column number",
+                 "Slice number"]
+# header of the coordinate file written during the scan (relative and absolute coordinates)
+COORD_HEADER = COORD_COLUMNS + ['Absolute X-coordinate [mm]', 'Absolute Y-coordinate [mm]',
+                                'Absolute Z-coordinate [mm]']
+COORD_DTYPES = {name: (np.float64 if name.endswith('[mm]') else np.int32) for name in COORD_COLUMNS}
+
+# number of coordinate rows written between two flushes of the coordinate file
+COORD_FLUSH_ROWS = 100
+
+# format of a coordinate row, coordinates are rounded to 3 decimals
+COORD_FMT = ['%d']*3 + ['%.3f']*3 + ['%d']*3 + ['%.3f']*3
+COORD_LINE = ','.join(COORD_FMT) + '\r\n'
+
+# time axis and eiwt per (operating frequency, sampling frequency, sample count)
+_EIWT_CACHE = {}
+
+# axis name per coordinate index
+_COORD_DIRS = ('x', 'y', 'z')
+# label of the slice, row and column direction per coordinate index, as used in the ini keys,
+# the last label is used for a zero vector
+_AXIS_LABELS = tuple(f'{d}-dir ' for d in _COORD_DIRS + ('unknown',))
+
+# number of samples after which the cos/sin recurrence of phasorSum is restarted from exact values
+PHASOR_RESYNC_SAMPLES = 4096
+
+
+def _ini_bool(value):
+    # same values and error as ConfigParser.getboolean ('True', 'true', 'yes', '1', ...)
+    try:
+        return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+    except KeyError:
+        raise ValueError(f'Not a boolean: {value}') from None
+
+
+def _ini_list(value):
+    return value.split(', ')
+
+
+# parameters read back by read_params_ini: (section, key, object ('' for the acquisition
+# itself), attribute, conversion)
+_INI_SCHEMA = (
+    ('Equipment', 'Driving system.serial_number', 'driving_system', 'serial', str),
+    ('Equipment', 'Driving system.name', 'driving_system', 'name', str),
+    ('Equipment', 'Driving system.manufact', 'driving_system', 'manufact', str),
+    ('Equipment', 'Driving system.available_ch', 'driving_system', 'available_ch', int),
+    ('Equipment', 'Driving system.connect_info', 'driving_system', 'connect_info', str),
+    ('Equipment', 'Driving system.tran_comp', 'driving_system', 'tran_comp', _ini_list),
+    ('Equipment', 'Driving system.is_active', 'driving_system', 'is_active', _ini_bool),
+
+    ('Equipment', 'Transducer.serial_number', 'transducer', 'serial', str),
+    ('Equipment', 'Transducer.name', 'transducer', 'name', str),
+    ('Equipment', 'Transducer.manufact', 'transducer', 'manufact', str),
+    ('Equipment', 'Transducer.elements', 'transducer', 'elements', int),
+    ('Equipment', 'Transducer.fund_freq', 'transducer', 'fund_freq', int),
+    ('Equipment', 'Transducer.natural_foc', 'transducer', 'natural_foc', float),
+    ('Equipment', 'Transducer.min_foc', 'transducer', 'min_foc', float),
+    ('Equipment', 'Transducer.max_foc', 'transducer', 'max_foc', float),
+    ('Equipment', 'Transducer.steer_info', 'transducer', 'steer_info', str),
+    ('Equipment', 'Transducer.is_active', 'transducer', 'is_active', _ini_bool),
+
+    ('Protocol', 'Sequence number', 'protocol', 'seq_number', int),
+    ('Protocol', 'Operating frequency [Hz]', 'protocol', 'oper_freq', int),
+    ('Protocol', 'Focus [um]', 'protocol', 'focus', int),
+    ('Protocol', 'Global power [mW] (NeuroFUS) or Amplitude [%] (IGT)', 'protocol', 'power_value', float),
+    ('Protocol', 'Path of Isppa to Global power conversion excel', 'protocol', 'path_conv_excel', str),
+    ('Protocol', 'Ramp mode (0 - rectangular, 1 - linear, 2 - tukey)', 'protocol', 'ramp_mode', int),
+    ('Protocol', 'Ramp duration [us]', 'protocol', 'ramp_dur', float),
+    ('Protocol', 'Ramp duration step size [us]', 'protocol', 'ramp_dur_step', float),
+    ('Protocol', 'Pulse duration [us]', 'protocol', 'pulse_dur', float),
+    ('Protocol', 'Pulse repetition interval [us]', 'protocol', 'pulse_rep_int', float),
+    ('Protocol', 'Pulse train duration [us]', 'protocol', 'pulse_train_dur', float),
+
+    ('Grid', 'Use coordinate excel as input?', 'protocol', 'use_coord_excel', _ini_bool),
+    ('Grid', 'Path of coordinate excel', 'protocol', 'path_coord_excel', str),
+
+    ('Picoscope', 'Sampling frequency [Hz]', '', 'pico_sampling_freq', float),
+    ('Picoscope', 'Hydrophone acquisition time [us]', '', 'sampling_duration_us', float),
+    ('Picoscope', 'Amount of samples per acquisition', '', 'sample_count', int),
+    )
+
+# _INI_SCHEMA keyed on (section, key as stored in the file), keys are stored in lower case
+_INI_FIELDS = {(section, key.lower()): (target, attr, conv)
+               for section, key, target, attr, conv in _INI_SCHEMA}
+
+
+def phasorSum(sig, w, beg, end):
+    """
+    return the real and imaginary part of sum(sig[n] * exp(1j*w*n)) for n in [beg, end)
+    cos(wn) and sin(wn) are obtained with a rotation recurrence, restarted every
+    PHASOR_RESYNC_SAMPLES samples to limit the accumulation of rounding errors
+    """
+    cw = math.cos(w)
+    sw = math.sin(w)
+    re = 0.0
+    im = 0.0
+    c = 1.0
+    s = 0.0
+    for n in range(beg, end):
+        if (n - beg) % PHASOR_RESYNC_SAMPLES == 0:
+            c = math.cos(w*n)
+            s = math.sin(w*n)
+        x = sig[n]
+        re += x*c
+        im += x*s
+        c, s = c*cw - s*sw, s*cw + c*sw
+    return re, im
+
+
+if njit is not None:
+    phasorSum = njit(cache=True, fastmath=True)(phasorSum)
+
+
+def phasorSums(raw, w, begs, ends, ampl, phase):
+    """
+    compute the amplitude and phase of the phasor of every signal raw[n] on its window
+    [begs[n], ends[n]), the signals are processed in parallel when compiled
+    """
+    for n in prange(len(begs)):
+        re, im = phasorSum(raw[n], w, begs[n], ends[n])
+        ampl[n] = math.hypot(re, im)*2.0/(ends[n] - begs[n])
+        phase[n] = math.atan2(im, re)
+
+
+if njit is not None:
+    phasorSums = njit(parallel=True, cache=True, fastmath=True)(phasorSums)
+
 
 class Acquisition:
     """
@@ -92,21 +239,34 @@ class Acquisition:
         self.outputJSON = None
         self.outputINI = None
 
+        # raw data and coordinate files stay open during the scan
+        self._raw_buffer = None  # raw signals of the scan, memory mapped on outputRaw
+        self.cplx_data = None  # amplitude and phase of the scan, memory mapped on outputACD
+        self._raw_rows = 0
+        self._coord_fh = None
+        self._coord_log = np.full((COORD_FLUSH_ROWS, 12), np.nan)  # coordinate rows not written yet
+        self._coord_first = 0  # row of outputRaw of the first row of _coord_log
+        self._coord_rows = 0
+
         self.nrowncol = None
         self.vectRow = None
         self.vectCol = None
 
         self.motors = MotorsXYZ(config['General']['Logger name'])
         self.gen = None
+        self._start_bytes = b'START\r'  # start command of the SC driving system
         self.fus = None
-        self.scope = pico.getScope("5244D")
+        self.scope = None  # opened in init_scope, shared by all acquisitions
         self.sampling_freq = 0
         self.sampling_period = 0
         self.sampling_duration_us = 0
         self.sample_count = 0
         self.pico_sampling_freq = 15625000
+        self.armed_delay_s = 0.025  # wait between arming the picoscope and starting the pulse sequence
         self.sequence = []
         self.signalA = None
+        self.eiwt = None
+        self.w_sample = 0
 
         self.begn = 0  # begining of the processing window
         self.endn = 1  # end of the processing window
@@ -114,9 +274,14 @@ class Acquisition:
         self.begus = 40
         self.protocol = None
         self.npoints = 2500
+        self.row_pixel_us_arr = None
+        self._begn_by_k = None  # begining of the processing window per column index
 
         self.coord_excel_data = None
+        self.coord_excel_indices = None
+        self._ce = None  # coordinate file columns as numpy arrays
         self.config = config
+        self._cwd = os.getcwd()  # relative equipment files are resolved against it
 
         self.driving_system = None
         self.transducer = None
@@ -126,6 +291,9 @@ class Acquisition:
 
         self.channels = 0
 
+        # pulse sequences and ramps per set of protocol parameters
+        self._seq_cache = {}
+
     def check_file(self, outfile):
         """
         check if filename provided already exist and is it does add a number at the end of the name
@@ -137,38 +305,51 @@ class Acquisition:
         if not os.path.isdir(head):  # if incorrect directory or no directory is given use CWD
             head = getcwd()
             raise OSError(f'directory does not exist: {head}')
-        fileok = not os.path.isfile(self.outputRaw)
+        # list the directory once instead of probing every candidate name
+        with os.scandir(head) as entries:
+            existing = {os.path.normcase(entry.name) for entry in entries if entry.is_file()}
+        fileok = os.path.normcase(tail) not in existing
         imax = 99
         i = 0
         filename = os.path.join(head, tail)
+        name, ext = os.path.splitext(tail)
         while not fileok:
-            name, ext = os.path.splitext(tail)
             fname = f'{name}_{i:02d}{ext}'
             filename = os.path.join(head, fname)
-            fileok = not os.path.isfile(filename)
+            fileok = os.path.normcase(fname) not in existing
             self.logger.debug(f'try: {filename} : ok ?: {fileok}')
             i += 1
             if i > imax:
                 raise OSError(f'no possible file name: {fname}')
         self.outputRaw = filename
-        self.outputACD = os.path.splitext(filename)[0]+'.acd'
-        self.outputRawCoord = os.path.splitext(filename)[0] + '_coord' +'.raw'
-        self.outputCoord = os.path.splitext(filename)[0]+'.csv'
-        # add header
-        with open(self.outputCoord, 'a', newline='') as outcoord:
-            csv.writer(outcoord, delimiter=',').writerow(['Measurement number', 'Cluster number', 'Indices number', 'X-coordinate [mm]', 'Y-coordinate [mm]', 'Z-coordinate [mm]', 'Row number', 'Column number', 'Slice number', 'Absolute X-coordinate [mm]',     'Absolute Y-coordinate [mm]', 'Absolute Z-coordinate [mm]'])
-
-        self.outputJSON = os.path.splitext(filename)[0]+'.json'
-        self.outputINI = os.path.splitext(filename)[0]+'.ini'
+        base = os.path.splitext(filename)[0]
+        self.outputACD = base + '.acd'
+        self.outputRawCoord = base + '_coord.raw'
+        self.outputCoord = base + '.csv'
+        # add header, the coordinate rows follow in batches (see flush_coord)
+        self._coord_fh = open(self.outputCoord, 'w', newline='', buffering=1 << 16)
+        self._coord_fh.write(','.join(COORD_HEADER) + '\r\n')
+
+        self.outputJSON = base + '.json'
+        self.outputINI = base + '.ini'
         self.logger.debug(f'file name raw: {self.outputRaw}, file name acd: {self.outputACD}')
 
     def adjust_beg(self, k):
-        newbegus = self.begus + self.adjust * k * self.row_pixel_us
-
         # begining of the processing window
-        begn = int(newbegus*1e-6*self.pico_sampling_freq)
-        endn = begn + self.npoints
-        return (begn, endn)
+        begn = self._begn_by_k[k]
+        return (begn, begn + self.npoints)
+
+    def init_window_table(self):
+        """
+        precompute the begining of the processing window for each column index k, so that
+        adjust_beg and slice_windows do not have to redo the conversion from us to samples
+        """
+        if self.row_pixel_us_arr is None:
+            self._begn_by_k = None
+            return
+
+        newbegus = self.begus + self.adjust * self.row_pixel_us_arr
+        self._begn_by_k = (newbegus*1e-6*self.pico_sampling_freq).astype(int).tolist()
 
     def init_grid(self):
         """
@@ -190,7 +371,17 @@ class Acquisition:
         self.vectCol = np.array(self.protocol.vectCol)
 
         # time in us for the US to propagate ever vectRow
-        self.row_pixel_us = np.linalg.norm(self.vectRow)/1.5
+        self.row_pixel_us = math.hypot(*self.vectRow)/1.5
+        # propagation time in us for each column index k
+        self.row_pixel_us_arr = self.row_pixel_us*np.arange(self.ncol)
+        self.init_window_table()
+
+        # coordinates of all grid points, grid_coord[i, j, k] is the position of slice i, row j
+        # and column k
+        i = np.arange(self.nsl)[:, None, None, None]
+        j = np.arange(self.nrow)[None, :, None, None]
+        k = np.arange(self.ncol)[None, None, :, None]
+        self.grid_coord = self.starting_pos + i*self.vectSl + j*self.vectCol + k*self.vectRow
 
     def init_grid_excel(self):
         # Import excel file containing coordinates
@@ -201,19 +392,15 @@ class Acquisition:
         if os.path.exists(excel_path):
             # [Measurement nr, Cluster nr, indices nr, Xcor(mm), Ycor(mm), Zcor(mm), rowNr,
             # colNr, SliceNr]
+            self.coord_excel_data = loadCoordTable(excel_path, self.logger)
 
-            path, ext = os.path.splitext(excel_path)
-
-            if ext == '.xlsx':
-                self.coord_excel_data = pd.read_excel(excel_path, engine='openpyxl')
-            elif ext == '.xls':
-                self.coord_excel_data = pd.read_excel(excel_path)
-            elif ext == '.csv':
-                self.coord_excel_data = pd.read_csv(excel_path)
+            # columns as numpy arrays, for positional indexing during the scan
+            self._ce = {name: self.coord_excel_data[name].to_numpy() for name in COORD_COLUMNS}
 
-            self.nrow = self.coord_excel_data.loc[:, "Row number"].max()
-            self.ncol = self.coord_excel_data.loc[:, "Column number"].max()
-            self.nsl = self.coord_excel_data.loc[:, "Slice number"].max()
+            # [rowNr, colNr, SliceNr] of each measurement
+            self.coord_excel_indices = self.coord_excel_data[["Row number", "Column number",
+                                                              "Slice number"]].to_numpy(dtype=np.int32)
+            self.nrow, self.ncol, self.nsl = self.coord_excel_indices.max(axis=0).tolist()
 
             self.protocol.nslices_nrow_ncol = [self.nsl, self.nrow, self.ncol]
 
@@ -249,7 +436,7 @@ class Acquisition:
 
             # Establish connection with driving system
             self.gen = serial.Serial(self.driving_system.connect_info, 115200, timeout=1)
-            startup_message = self.gen.readline().decode("ascii").strip()
+            startup_message = self._read_ack()
             self.logger.info(f"Driving system: {startup_message}")
 
             if startup_message == 'E2':
@@ -267,7 +454,7 @@ class Acquisition:
             unifus.setLogLevel(unifus.LogLevel.Debug)
 
             # Update the name of your configuration file
-            igt_config = os.path.join(os.getcwd(), self.driving_system.connect_info)
+            igt_config = os.path.join(self._cwd, self.driving_system.connect_info)
             if igt_config != '':
                 self.fus.loadConfig(igt_config)
             else:
@@ -286,6 +473,13 @@ class Acquisition:
 
             self.gen = self.fus.gen()
 
+    def _read_ack(self):
+        """
+        read one response line of the SC driving system
+        returns as soon as the line terminator is received
+        """
+        return tpoCom.decodeAck(self.gen.read_until(b'\n', 64))
+
     def init_pulse_sequence(self):
         """
         initialize the pulse sequence
@@ -299,9 +493,8 @@ class Acquisition:
             com_bridge = tpoCom.tpoCommunication(self.config['General']['Logger name'], self.gen)
             com_bridge.resetParameters()
 
-            com_bridge.setOperatingFreq(self.protocol.oper_freq)
-            com_bridge.setFocus(self.protocol.focus)
-            com_bridge.setGlobalPower(self.protocol.power_value)
+            com_bridge.setFreqFocusAndPower(self.protocol.oper_freq, self.protocol.focus,
+                                            self.protocol.power_value)
             com_bridge.setBurstAndPeriod(self.protocol.pulse_dur, self.protocol.pulse_rep_int)
             com_bridge.setTimer(self.protocol.pulse_train_dur)
             com_bridge.setRamping(self.protocol.ramp_mode, self.protocol.ramp_dur,
@@ -311,100 +504,106 @@ class Acquisition:
             self.channels = self.gen.getParam(unifus.GenParam.ChannelCount)
             self.logger.info("Generator: %d channels" % self.channels)
 
-            # Define pulse
-            pulse = unifus.Pulse(self.channels, 1, 1)  # n phases, n frequencies, n amplitudes
-
-            pulse_dur_ms = self.protocol.pulse_dur/1000  # convert from us to ms
-            pulse_rep_int_ms = self.protocol.pulse_rep_int/1000  # convert from us to ms
+            # The sequence and ramps only depend on the protocol parameters, reuse them when
+            # the pulse sequence is initialized again with the same parameters
+            seq_key = (self.protocol.pulse_dur, self.protocol.pulse_rep_int,
+                       self.protocol.pulse_train_dur, self.protocol.ramp_mode,
+                       self.protocol.ramp_dur, self.protocol.ramp_dur_step,
+                       self.protocol.oper_freq, self.protocol.power_value, self.protocol.focus,
+                       self.channels)
 
-            # duration: 25us, delay: 500ms
-            pulse.setDuration(pulse_dur_ms, round(pulse_rep_int_ms - pulse_dur_ms, 1))
+            if seq_key in self._seq_cache:
+                self.seq, rampUp, rampDown, myStepDurationMs = self._seq_cache[seq_key]
+            else:
+                # Define pulse
+                pulse = unifus.Pulse(self.channels, 1, 1)  # n phases, n frequencies, n amplitudes
 
-            # set same frequency for all channels = 250KHz, in Hz
-            pulse.setFrequencies([self.protocol.oper_freq])
+                pulse_dur_ms = self.protocol.pulse_dur/1000  # convert from us to ms
+                pulse_rep_int_ms = self.protocol.pulse_rep_int/1000  # convert from us to ms
 
-            # set same amplitude for all channels in percent (of max amplitude)
-            pulse.setAmplitudes([self.protocol.power_value])
+                # duration: 25us, delay: 500ms
+                pulse.setDuration(pulse_dur_ms, round(pulse_rep_int_ms - pulse_dur_ms, 1))
 
-            if self.config['Equipment.Manufacturer.IS']['Name'] == self.transducer.manufact:
-                ini_path = os.path.join(os.getcwd(), self.transducer.steer_info)
+                # set same frequency for all channels = 250KHz, in Hz
+                pulse.setFrequencies([self.protocol.oper_freq])
 
-                trans = transducerXYZ.Transducer(self.logger)
-                if not trans.load(ini_path):
-                    self.logger.error(f'Error: can not load the transducer definition from {ini_path}')
-                    sys.exit()
+                # set same amplitude for all channels in percent (of max amplitude)
+                pulse.setAmplitudes([self.protocol.power_value])
 
-                focus_mm = round(self.protocol.focus/1000, 1)  # convert from um to mm
-                # Calculate target focus with respect to natural focus: + is before natural focus,
-                # - is after natural focus
-                aim_wrt_natural_focus = self.transducer.natural_foc - focus_mm
+                if self.config['Equipment.Manufacturer.IS']['Name'] == self.transducer.manufact:
+                    ini_path = os.path.join(self._cwd, self.transducer.steer_info)
 
-                # Aim n mm away from the natural focal spot, on main axis (Z)
-                trans.computePhases(pulse, (0, 0, aim_wrt_natural_focus), focus_mm)
+                    trans = transducerXYZ.Transducer(self.logger)
+                    if not trans.load(ini_path):
+                        self.logger.error(f'Error: can not load the transducer definition from {ini_path}')
+                        sys.exit()
 
-            # Assume NeuroFUS transducers are used
-            else:
-                phases = self.getPhases()
-                pulse.setPhases(phases)  # set same phase offset for all channels (angle in [0,360] degrees)
-
-            # Define pulse train
-            pulse_train_dur_ms = self.protocol.pulse_train_dur/1000 # convert from us to ms
-
-            nPulseTrain = math.floor(pulse_train_dur_ms / pulse_rep_int_ms)      # number of executions of one pulse train
-
-            # Not used right now during characterization
-            self.nPulseTrainRep = 1
-            self.pulseTrainDelay = 0
-            # =============================================================================
-            #             pulseTrainDelay = pulse_rep_int_ms - pulse_train_dur_ms  # milliseconds between pulse trains
-            #             #execFlags = unifus.ExecFlag.MeasureBoards
-            #                 # Use unifus.ExecFlag.NONE if nothing special, or simply don't pass the execFlags argument.
-            #                 # Use '|' to combine multiple flags: flag1 | flag2 | flag3
-            #                 # To use trigger, add one of unifus::ExecFlag::Trigger*
-            #                 # execFlags = unifus.ExecFlag.MeasureTimings | unifus.ExecFlag.TriggerAllSequences
-            # 
-            #             # Define pulse train repetition
-            #             nPulseTrainRep = math.floor(self.protocol.pulse_train_rep_dur / self.protocol.pulse_train_rep_int)     # number of executions of one pulse train
-            # =============================================================================
-
-            # # | unifus.ExecFlag.MeasureBoards
-            self.execFlags = unifus.ExecFlag.MeasureTimings | unifus.ExecFlag.DisableMonitoringChannelCombiner | unifus.ExecFlag.DisableMonitoringChannelCurrentOut
-            # flags to disable checking the current limit
-
-            # Define a complete sequence
-            self.seqBuffer = 0
-            self.seq = []
-            self.seq += nPulseTrain * [pulse]
-
-            # Apply ramping
-
-            # Execution with pulse modulation (automatically disable ramps if any)
-            # Values are attenuation in percent of the full Pulse amplitude.
-            # 0 = no attenuation = full amplitude, 100 = full attenuation = 0 amplitude.
-            # Check gen.getTiming (unifus.GenTiming.Min/MaxModulationStep) for valid range.
-            myStepDurationMs = self.protocol.ramp_dur_step/1000  # convert from us to ms, for example, 1ms / step
-            if myStepDurationMs < self.gen.getTiming(unifus.GenTiming.MinModulationStep):
-                myStepDurationMs = self.gen.getTiming(unifus.GenTiming.MinModulationStep)
-            elif myStepDurationMs > self.gen.getTiming(unifus.GenTiming.MaxModulationStep):
-                myStepDurationMs = self.gen.getTiming(unifus.GenTiming.MaxModulationStep)
-
-            pulse_ramp_dur_ms = self.protocol.ramp_dur/1000  # convert from us to ms
-            if self.protocol.ramp_mode != 0:
-                aRamp = getRampingAmplitude(self.protocol.ramp_mode,
-                                            pulse_ramp_dur_ms, myStepDurationMs)
-                maxAmpl = 100  # %
+                    focus_mm = round(self.protocol.focus/1000, 1)  # convert from um to mm
+                    # Calculate target focus with respect to natural focus: + is before natural focus,
+                    # - is after natural focus
+                    aim_wrt_natural_focus = self.transducer.natural_foc - focus_mm
 
-                # Note: ramp up and ramp down order are the other way around
-                # ramp up descends, ramp down ascends
-                rampDown = aRamp * maxAmpl
-                rampDown = [int(pUp) for pUp in rampDown]
+                    # Aim n mm away from the natural focal spot, on main axis (Z)
+                    trans.computePhases(pulse, (0, 0, aim_wrt_natural_focus), focus_mm)
 
-                rampUp = np.flip(aRamp) * maxAmpl
-                rampUp = [int(pDown) for pDown in rampUp]
+                # Assume NeuroFUS transducers are used
+                else:
+                    phases = self.getPhases()
+                    pulse.setPhases(phases.tolist())  # set same phase offset for all channels (angle in [0,360] degrees)
+
+                # Define pulse train
+                pulse_train_dur_ms = self.protocol.pulse_train_dur/1000 # convert from us to ms
+
+                nPulseTrain = int(pulse_train_dur_ms // pulse_rep_int_ms)      # number of executions of one pulse train
+
+                # Not used right now during characterization
+                self.nPulseTrainRep = 1
+                self.pulseTrainDelay = 0
+                # =============================================================================
+                #             pulseTrainDelay = pulse_rep_int_ms - pulse_train_dur_ms  # milliseconds between pulse trains
+                #             #execFlags = unifus.ExecFlag.MeasureBoards
+                #                 # Use unifus.ExecFlag.NONE if nothing special, or simply don't pass the execFlags argument.
+                #                 # Use '|' to combine multiple flags: flag1 | flag2 | flag3
+                #                 # To use trigger, add one of unifus::ExecFlag::Trigger*
+                #                 # execFlags = unifus.ExecFlag.MeasureTimings | unifus.ExecFlag.TriggerAllSequences
+                # 
+                #             # Define pulse train repetition
+                #             nPulseTrainRep = math.floor(self.protocol.pulse_train_rep_dur / self.protocol.pulse_train_rep_int)     # number of executions of one pulse train
+                # =============================================================================
+
+                # # | unifus.ExecFlag.MeasureBoards
+                self.execFlags = unifus.ExecFlag.MeasureTimings | unifus.ExecFlag.DisableMonitoringChannelCombiner | unifus.ExecFlag.DisableMonitoringChannelCurrentOut
+                # flags to disable checking the current limit
+
+                # Define a complete sequence
+                self.seqBuffer = 0
+                self.seq = []
+                self.seq += nPulseTrain * [pulse]
+
+                # Apply ramping
+
+                # Execution with pulse modulation (automatically disable ramps if any)
+                # Values are attenuation in percent of the full Pulse amplitude.
+                # 0 = no attenuation = full amplitude, 100 = full attenuation = 0 amplitude.
+                # Check gen.getTiming (unifus.GenTiming.Min/MaxModulationStep) for valid range.
+                myStepDurationMs = self.protocol.ramp_dur_step/1000  # convert from us to ms, for example, 1ms / step
+                if myStepDurationMs < self.gen.getTiming(unifus.GenTiming.MinModulationStep):
+                    myStepDurationMs = self.gen.getTiming(unifus.GenTiming.MinModulationStep)
+                elif myStepDurationMs > self.gen.getTiming(unifus.GenTiming.MaxModulationStep):
+                    myStepDurationMs = self.gen.getTiming(unifus.GenTiming.MaxModulationStep)
+
+                pulse_ramp_dur_ms = self.protocol.ramp_dur/1000  # convert from us to ms
+                rampUp = rampDown = None
+                if self.protocol.ramp_mode != 0:
+                    rampUp, rampDown = getRampModulation(self.protocol.ramp_mode,
+                                                         pulse_ramp_dur_ms, myStepDurationMs)
+
+                self._seq_cache[seq_key] = (self.seq, rampUp, rampDown, myStepDurationMs)
 
+            if self.protocol.ramp_mode != 0:
                 self.gen.setPulseModulation(
-                    rampUp, myStepDurationMs,   # beginning
-                    rampDown, myStepDurationMs)   # end
+                    list(rampUp), myStepDurationMs,   # beginning
+                    list(rampDown), myStepDurationMs)   # end
 
             # (optional) restore disabled channels
             self.gen.enableAllChannels()
@@ -421,26 +620,25 @@ class Acquisition:
         focus_mm = round(self.protocol.focus/1000, 1)  # convert from um to mm
 
         # Import excel file containing phases per focal depth
-        excel_path = os.path.join(os.getcwd(), self.transducer.steer_info)
+        excel_path = os.path.join(self._cwd, self.transducer.steer_info)
 
         self.logger.info('Extract phase information from ' + excel_path)
 
         if os.path.exists(excel_path):
-            data = pd.read_excel(excel_path, engine='openpyxl')
+            phase_table, duplicates = loadPhaseTable(excel_path, int(self.channels))
 
             # Make sure both values have the same amount of decimals
             focus = round(focus_mm, 1)
-            match_row = data.loc[data['Distance'] == focus]
 
-            if match_row.empty:
-                self.logger.error(f'No focus in transducer phases file {excel_path} corresponds with {focus_mm}')
-                sys.exit()
-            elif len(match_row) > 1:
+            if focus in duplicates:
                 self.logger.error(f'Duplicate foci {focus_mm} found in transducer phases file {excel_path}')
                 sys.exit()
+            elif focus not in phase_table:
+                self.logger.error(f'No focus in transducer phases file {excel_path} corresponds with {focus_mm}')
+                sys.exit()
 
             # Retrieve phases dependent of number of channels
-            phases = [match_row.iloc[0][1:int(self.channels)+1]].to_list()
+            phases = phase_table[focus]
 
         else:
             self.logger.error("Pipeline is cancelled. The following direction cannot be found: " + excel_path)
@@ -454,11 +652,10 @@ class Acquisition:
         """
 
         if self.config['Equipment.Manufacturer.SC']['Name'] == self.driving_system.manufact:
-            cmd = 'START\r'
-            nb = self.gen.write(cmd.encode('ascii'))
-            time.sleep(0.05)
-            line = self.gen.readline().decode('ascii')
-            print(f'START: {line}')
+            nb = self.gen.write(self._start_bytes)
+            # wait for the acknowledgement instead of a fixed delay
+            line = self._read_ack()
+            self.logger.debug('START ack: %s', line)
 
         elif self.config['Equipment.Manufacturer.IGT']['Name'] == self.driving_system.manufact:
             try:
@@ -483,26 +680,41 @@ class Acquisition:
         """
         # do not hesitate to increase the multiplication factor to 15 (15 points per cycle)
         self.sampling_freq = sampl_freq_multi*self.protocol.oper_freq
-        self.scope.openUnit(pico.Resolution.DR_14BIT)
+        self.scope = pico.getOpenScope("5244D", pico.Resolution.DR_14BIT)
         # #        self.scope.closeChannels()
         # in an exploration phase using the picoscope with the same generator settings
         # determine the max voltage to set the range (pico.Range.RANGE_10V)
         self.scope.openChannel(pico.Channel.A, pico.Range.RANGE_500mV, pico.Coupling.DC, pico.Probe.x1)
         self.timebase = self.scope.timeBase(self.sampling_freq)
-        self.pico_sampling_freq = self.scope.samplingRate(self.timebase)
-        self.sampling_period = 1.0/self.pico_sampling_freq
-        self.logger.debug(f'sampling freq: {self.sampling_freq}, timebase: {self.timebase}, actual sampling freq: {self.pico_sampling_freq}')
+        self.set_sampling_freq(self.scope.samplingRate(self.timebase))
+        self.logger.debug('sampling freq: %s, timebase: %s, actual sampling freq: %s', self.sampling_freq, self.timebase, self.pico_sampling_freq)
         threshold = 0.5  # trigger threshold on EXT channel set to 0.5V
         self.scope.initEXTTrigger(pico.Probe.x1, threshold, direction=pico.Trigger.Direction.RISING, ignoredSamples=0, timeout=0)
-        time.sleep(4)
+
+        # wait until the scope responds (at most 4 s), polling with an increasing delay
+        deadline = time.monotonic() + 4.0
+        delay = 0.01
+        while not self.scope.pingUnit():
+            if time.monotonic() >= deadline:
+                self.logger.warning('Picoscope did not respond to a ping within 4 s')
+                break
+            time.sleep(delay)
+            delay = min(delay*2, 0.2)
 
     def init_scope_params(self, sampl_freq_multi):
         """
         Initialize picoscope parameters: sampling frequency
         """
         self.sampling_freq = sampl_freq_multi*self.protocol.oper_freq
-        self.pico_sampling_freq = self.sampling_freq
-        self.sampling_period = 1.0/self.pico_sampling_freq
+        self.set_sampling_freq(self.sampling_freq)
+
+    def set_sampling_freq(self, freq):
+        """
+        set the actual sampling frequency and the values derived from it, these are computed
+        once here and reused by the processing
+        """
+        self.pico_sampling_freq = freq
+        self.sampling_period = 1.0/freq
 
     def init_aquisition(self, duration_us):
         """
@@ -510,7 +722,7 @@ class Acquisition:
         """
         self.sample_count = int(duration_us * self.pico_sampling_freq/1e6)
         self.sampling_duration_us = duration_us
-        self.logger.debug(f'duration_us: {duration_us}, sample count: {self.sample_count}')
+        self.logger.debug('duration_us: %s, sample count: %s', duration_us, self.sample_count)
 
     def init_scan(self, scan='Dir'):
         """
@@ -521,41 +733,83 @@ class Acquisition:
         self.logger.debug(f'scan: {scan}')
         self.grid = Scan_Iter(self.nsl,self.nrow,self.ncol,scan=scan)
 
-    def acquire_data(self, attempt=0):
+    def acquire_data(self, max_retries=5):
         """
         acquire data will:
             start acquisition on the picoscope (wait for trigger)
             execute the pulse sequence (which will trigger the picoscope
-            wait until the data has been acquired
+            wait until the data has been acquired, redo the acquisition up to max_retries times
             read the data from the picoscope into signalA (because channel A is used)
         """
+        self.start_acquisition()
+        self.finish_acquisition(max_retries)
+
+    def start_acquisition(self):
+        """
+        start acquisition on the picoscope (wait for trigger) and execute the pulse sequence,
+        the host is free until finish_acquisition is called
+        """
         self.scope.startAcquisitionTB (self.sample_count, self.timebase) # start picoscope acquisition on trigger
-        time.sleep(0.025)
+        time.sleep(self.armed_delay_s)
         self.exec_pulse_sequence()                    # execute pulse sequence
-        ok = self.scope.waitAcquisition()                # wait for acquisition to complete
 
-        if not ok and attempt < 5:
-            # redo acquisition
+    def finish_acquisition(self, max_retries=5):
+        """
+        wait until the data has been acquired, redo the acquisition up to max_retries times
+        and read the data from the picoscope into signalA
+        raises PicoError if the last attempt fails, the picoscope buffer then still holds the
+        previous signal
+        """
+        scope = self.scope
+        sample_count = self.sample_count
+        attempt = 0
+        while not scope.waitAcquisition():                # wait for acquisition to complete
+            self.logger.warning(f'Acquisition failed (attempt {attempt + 1} of {max_retries + 1})')
             attempt += 1
-            self.acquire_data(attempt)
+            if attempt > max_retries:
+                self.logger.error(f'Acquisition failed {attempt} times, stopping')
+                raise pico.PicoError(f'No acquisition after {attempt} attempts.')
+            # redo acquisition
+            self.start_acquisition()
 
-        self.signalA = self.scope.readVolts()[0]     # transfer data from picoscope
-        msg = f'signalA size: {self.signalA.size}, dtype: {self.signalA.dtype}'
-        self.logger.debug(msg)
+        if self.signalA is None or self.signalA.size != sample_count:
+            self.signalA = np.empty(sample_count, dtype=np.float32)
+        scope.readVolts(out=[self.signalA])     # transfer data from picoscope into signalA
+        self.logger.debug('signalA size: %d, dtype: %s', self.signalA.size, self.signalA.dtype)
 
-    def save_data(self, measur_nr, cluster_nr, indices_nr, relatXYZ, row_nr, col_nr, sl_nr, destXYZ):
+    def save_data(self, measur_nr, cluster_nr, indices_nr, relatXYZ, row_nr, col_nr, sl_nr, destXYZ,
+                  raw_row=None):
         """
         save the acquired data in a float32 format into outpuRaw
+        raw_row: row of outputRaw to write, by default the row after the previous one
         """
-        with open(self.outputRaw,'ab') as outraw:
-            self.signalA.tofile(outraw)
-            
-        with open(self.outputCoord, 'a', newline='') as outcoord:
-            # round down floats to 3 decimals
-            relatXYZ = [round(coord,3) for coord in relatXYZ]
-            destXYZ = [round(coord,3) for coord in destXYZ]
-
-            csv.writer(outcoord, delimiter=',').writerow([measur_nr, cluster_nr, indices_nr, relatXYZ[0], relatXYZ[1], relatXYZ[2], row_nr, col_nr, sl_nr, destXYZ[0], destXYZ[1], destXYZ[2]])
+        # the file is memory mapped, the OS writes the pages to disk during the scan
+        if raw_row is None:
+            raw_row = self._raw_rows
+        self._raw_buffer[raw_row] = self.signalA
+        self._raw_rows = raw_row + 1
+
+        # coordinate rows are collected in the row order of outputRaw and written per block of
+        # rows, so that the coordinates are on disk if the scan is interrupted
+        self._coord_log[raw_row - self._coord_first] = (measur_nr, cluster_nr, indices_nr, relatXYZ[0], relatXYZ[1], relatXYZ[2], row_nr, col_nr, sl_nr, destXYZ[0], destXYZ[1], destXYZ[2])
+        self._coord_rows += 1
+        if self._coord_rows == len(self._coord_log):
+            self.flush_coord()
+
+    def flush_coord(self):
+        """
+        write the collected coordinate rows to the coordinate file, the rows of a block that
+        were not acquired (interrupted scan) are skipped
+        """
+        if self._coord_rows > 0:
+            # formatted as one string and written with a single call
+            log = self._coord_log
+            rows = log[~np.isnan(log[:, 0])].tolist()
+            self._coord_fh.write(''.join([COORD_LINE % tuple(row) for row in rows]))
+            self._coord_fh.flush()
+            log.fill(np.nan)
+            self._coord_first += len(log)
+            self._coord_rows = 0
     
     def init_motor(self, port=None):
         """
@@ -574,27 +828,161 @@ class Acquisition:
         """
         prepare the processing of the data (based on the sampling frequency and the signal frequency
         """
-        self.t = self.sampling_period*np.arange(0,self.sample_count) # self.t[n] is the sampling time for sample n
-        self.eiwt = np.exp(1j * 2 * np.pi * self.protocol.oper_freq * self.t)  # cos(wt) + j sin(wt)
+        # angular step per sample, used by the compiled phasor calculation
+        self.w_sample = 2 * np.pi * self.protocol.oper_freq * self.sampling_period
+
+        # time axis and eiwt only depend on these values, reuse them for following protocols
+        key = (self.protocol.oper_freq, self.pico_sampling_freq, self.sample_count)
+        if key not in _EIWT_CACHE:
+            t = self.sampling_period*np.arange(0,self.sample_count) # t[n] is the sampling time for sample n
+            eiwt = None
+            if njit is None:
+                # exp(1j*w*t) stored as float32 (cos, sin) columns, so the phasor of the float32
+                # signal is a real matrix product without a complex copy of the signal
+                # (the phase itself is computed in double precision)
+                eiwt = np.empty((self.sample_count, 2), dtype=np.float32)
+                if numexpr is not None:
+                    w = 2 * np.pi * self.protocol.oper_freq
+                    eiwt[:, 0] = numexpr.evaluate("cos(w * t)", local_dict={'w': w, 't': t})
+                    eiwt[:, 1] = numexpr.evaluate("sin(w * t)", local_dict={'w': w, 't': t})
+                else:
+                    phase = np.arange(self.sample_count) * self.w_sample
+                    np.cos(phase, out=eiwt[:, 0])
+                    np.sin(phase, out=eiwt[:, 1])
+            _EIWT_CACHE[key] = (t, eiwt)
+
+        self.t, self.eiwt = _EIWT_CACHE[key]
+
+        if njit is not None:
+            # compile (or load from the cache) the phasor kernel now, instead of when the
+            # first slice is processed during the scan
+            phasorSums(np.zeros((1, 1), dtype=np.float32), self.w_sample,
+                       np.zeros(1, dtype=np.int64), np.ones(1, dtype=np.int64),
+                       np.empty(1, dtype=np.float32), np.empty(1, dtype=np.float32))
 
-    def process_data(self, beg=0, end=None):
+    def process_data(self, beg=0, end=None, sig=None):
         """
-        process the data by calculating a phasor (amplitude and phase)
+        process the data (signalA by default) by calculating a phasor (amplitude and phase)
         returns the phasor (amplitude and phase of the signal)
         """
+        if sig is None:
+            sig = self.signalA
         if not end:
             end = self.sample_count
         npoints = end-beg
-        phasor = np.dot(self.signalA[beg:end], self.eiwt[beg:end])
-        phaseA = cmath.phase(phasor)
-        amplA = abs(phasor)*2.0/npoints
-        self.logger.debug(f'amplA: {amplA:.3f}, phaseA: {math.degrees(phaseA):.3f}')
+        if njit is not None:
+            re, im = phasorSum(sig, self.w_sample, beg, end)
+        else:
+            re, im = np.dot(sig[beg:end], self.eiwt[beg:end]).tolist()
+        phaseA = math.atan2(im, re)
+        amplA = math.hypot(re, im)*2.0/npoints
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('amplA: %.3f, phaseA: %.3f', amplA, math.degrees(phaseA))
         return (amplA, phaseA)
 
-    def close_all(self):
+    def process_saved(self, n0, n1, out, begs, ends):
+        """
+        process the signals n0 to n1 (excluded) saved in the raw buffer, the amplitudes and
+        phases are written into out[0, n] and out[1, n]
+        begs and ends are the processing windows of each point of a slice
+        with numba the signals are processed in one parallel pass, otherwise the signals
+        sharing a window are processed with a single matrix product
+        """
+        i0 = n0 % len(begs)
+        i1 = i0 + n1 - n0
+        begs = begs[i0:i1]
+        ends = ends[i0:i1]
+        if njit is not None:
+            phasorSums(self._raw_buffer[n0:n1], self.w_sample, begs, ends,
+                       out[0, n0:n1], out[1, n0:n1])
+            return
+
+        for beg, end in set(zip(begs.tolist(), ends.tolist())):
+            rows = n0 + np.flatnonzero((begs == beg) & (ends == end))
+            re, im = (self._raw_buffer[rows, beg:end] @ self.eiwt[beg:end]).T
+            out[0, rows] = np.hypot(re, im)*(2.0/(end - beg))
+            out[1, rows] = np.arctan2(im, re)
+
+    def finish_slice(self, n0, n1, begs, ends):
+        """
+        write the complete slice n0 to n1 (excluded) of the raw buffer to disk and process it
+        into cplx_data, run by the worker thread of the scan
+        """
+        self.flush_raw()  # a complete slice is on disk if the scan is interrupted
+        # flat view on cplx_data, indexed by the measurement counter
+        self.process_saved(n0, n1, self.cplx_data.reshape(2, -1), begs, ends)
+
+    def slice_windows(self, beg=None, end=None):
+        """
+        return the begining and end of the processing window of each signal of a slice
+        beg, end: same window [beg..end] for all signals instead of the processing window
+        """
+        # int64 on all platforms, the type the phasor kernel is compiled for in init_processing
+        size = self.nrow*self.ncol
+        if beg is None:
+            if self.adjust != 0:
+                begs = np.asarray(self._begn_by_k, dtype=np.int64)[np.arange(size) % self.ncol]
+                return begs, begs + self.npoints
+            beg, end = self.begn, self.endn or self.sample_count
+        return np.full(size, beg, dtype=np.int64), np.full(size, end, dtype=np.int64)
+
+    def close(self):
+        """
+        close the output files that are kept open during the scan
+        """
+        if self._raw_buffer is not None:
+            self.flush_raw()
+            self._raw_buffer = None  # releases the memory map
+        if self.cplx_data is not None:
+            self.cplx_data.flush()
+            self.cplx_data = None  # releases the memory map, so the output folder can be moved
+        if self._coord_fh is not None:
+            self.flush_coord()
+            self._coord_fh.close()
+            self._coord_fh = None
+
+    def open_raw_output(self, coord_rows=COORD_FLUSH_ROWS):
+        """
+        create the raw data file for the scan and map it in memory, it is closed by close()
+        the file is allocated for all points of the scan, a signal is saved by storing it in
+        its row
+        coord_rows: number of rows of a block of the coordinate file, the coordinate rows of a
+        block are written together when all rows of the block are saved
+        """
+        if self._raw_buffer is None:
+            self._raw_buffer = np.memmap(self.outputRaw, dtype=np.float32, mode='w+',
+                                         shape=(self.nsl*self.nrow*self.ncol, self.sample_count))
+            self._raw_rows = 0
+            self._coord_log = np.full((coord_rows, 12), np.nan)
+            self._coord_first = 0
+            self._coord_rows = 0
+
+    def open_acd_output(self):
+        """
+        create the ACD file for the scan and map it in memory as cplx_data
+        (amplitude and phase per slice, row and column)
+        """
+        self.cplx_data = np.memmap(self.outputACD, dtype=np.float32, mode='w+',
+                                   shape=(2, self.nsl, self.nrow, self.ncol))
+
+    def flush_raw(self):
+        """
+        write the saved raw signals to the raw data file
+        """
+        self._raw_buffer.flush()
+
+    def close_all(self, close_scope=False):
+        """
+        close the output files and disconnect from the equipment
+        the picoscope stays open for the next acquisition unless close_scope is True,
+        use pico.closeOpenScopes() when all acquisitions are finished
+        """
+        self.close()
+
         if self.motors.connected:
             self.motors.disconnect()
-        self.scope.closeUnit()
+        if close_scope:
+            pico.closeOpenScopes()
 
         # When fus is none, probably NeuroFUS system used
         if self.fus is None:
@@ -604,6 +992,36 @@ class Acquisition:
             self.fus.clearListeners()
             self.fus.disconnect()
 
+    def init_scan_coord(self, coord_focus):
+        """
+        prepare the numbers and coordinates of all measurements in grid order, so that the
+        scan loop only has to index them
+        returns:
+            nrs: list of [Measurement nr, Cluster nr, indices nr, rowNr, colNr, SliceNr]
+            relat: (N, 3) array of coordinates relative to coord_focus
+            dest: (N, 3) array of absolute coordinates
+        """
+        coord_focus = np.asarray(coord_focus, dtype=float)
+
+        if self.protocol.use_coord_excel:
+            ce = self._ce
+            nrs = np.stack([ce["Measurement number"], ce["Cluster number"], ce["Indices number"],
+                            ce["Row number"], ce["Column number"], ce["Slice number"]],
+                           axis=1).tolist()
+            relat = np.stack([ce["X-coordinate [mm]"], ce["Y-coordinate [mm]"],
+                              ce["Z-coordinate [mm]"]], axis=1).astype(float)
+            dest = relat + coord_focus
+        else:
+            sl, row, col = np.meshgrid(np.arange(self.nsl), np.arange(self.nrow),
+                                       np.arange(self.ncol), indexing='ij')
+            measur = np.arange(1, sl.size + 1)
+            nrs = np.stack([measur, np.ones_like(measur), measur, row.ravel(), col.ravel(),
+                            sl.ravel()], axis=1).tolist()
+            dest = self.grid_coord.reshape(-1, 3)
+            relat = dest - coord_focus
+
+        return nrs, relat, dest
+
     def scan_grid(self, coord_focus):
         """
         scan the predefined grid and save the raw data and the complex acoustic data for each
@@ -617,53 +1035,57 @@ class Acquisition:
         adjust=0 : no adjustment
         """
 
-        self.cplx_data = np.zeros((2, self.nsl, self.nrow, self.ncol), dtype='float32')
-
-        counter = 0
-        for i in range(self.nsl):
-            for j in range(self.nrow):
-                for k in range(self.ncol):
-                    if self.protocol.use_coord_excel:
-                        measur_nr = self.coord_excel_data.loc[counter, "Measurement number"]
-                        cluster_nr = self.coord_excel_data.loc[counter, "Cluster number"]
-                        indices_nr = self.coord_excel_data.loc[counter, "Indices number"]
-                        relatXYZ = [self.coord_excel_data.loc[counter, "X-coordinate [mm]"], self.coord_excel_data.loc[counter,"Y-coordinate [mm]"], self.coord_excel_data.loc[counter,"Z-coordinate [mm]"]]
-                        destXYZ = [relatXYZ[0] + coord_focus[0], relatXYZ[1] + coord_focus[1], relatXYZ[2] + coord_focus[2] ]
-                        row_nr = self.coord_excel_data.loc[counter, "Row number"]
-                        col_nr = self.coord_excel_data.loc[counter, "Column number"]
-                        sl_nr = self.coord_excel_data.loc[counter, "Slice number"]
-
-                    else:
-                        measur_nr = counter + 1
-                        cluster_nr = 1
-                        indices_nr = measur_nr
-                        destXYZ = self.starting_pos + i*self.vectSl + j*self.vectCol + k*self.vectRow
-                        relatXYZ = [destXYZ[0] - coord_focus[0], destXYZ[1] - coord_focus[1], destXYZ[2] - coord_focus[2]]
-                        row_nr = j
-                        col_nr = k
-                        sl_nr = i
-
-                    self.logger.info(f'destXYZ: pos: {destXYZ[0]:.3f}, {destXYZ[1]:.3f}, {destXYZ[2]:.3f}')
-                    n = i*self.nrow*self.ncol+j*self.ncol+k
-                    self.logger.info(f'i: {i}, j: {j}, k: {k}, n: {n}')
-                    self.motors.move(list(destXYZ), relative=False)
-                    self.acquire_data()
-
-                    # [Measurement nr, Cluster nr, indices nr, Xcor(mm), Ycor(mm), Zcor(mm), rowNr, colNr, SliceNr]
-                    self.save_data(measur_nr, cluster_nr, indices_nr, relatXYZ, row_nr, col_nr, sl_nr, destXYZ)
-
-                    if self.adjust!=0:
-                        self.begn, self.endn= self.adjust_beg(k)
-                        self.logger.debug(f'k: {k}, begus: {self.begus:.2f}, npoints {self.npoints}, beg: {self.begn}, end: {self.endn}')
-                    a,p = self.process_data(beg=self.begn,end=self.endn)
-                    self.cplx_data[0,i,j,k]=a
-                    self.cplx_data[1,i,j,k]=p
-                    time.sleep(0.025)
-
-                    counter = counter + 1
-
-        with open(self.outputACD,'wb') as outacd:
-            self.cplx_data.tofile(outacd)
+        self.open_acd_output()
+        scan_nrs, scan_relat, scan_dest = self.init_scan_coord(coord_focus)
+
+        # a complete slice is flushed and processed by a worker thread, while the scan goes on,
+        # its coordinate rows are written at the same time in the row order of outputRaw
+        slice_size = self.nrow*self.ncol
+        self.open_raw_output(coord_rows=slice_size)
+        slice_begs, slice_ends = self.slice_windows()
+        jobs = []
+
+        # (slice, row, col) index list. A regular grid is scanned serpentine: the columns are
+        # reversed on every other row and the rows on every other slice, so the motors never
+        # travel back to the start of a row or slice. The order of a coordinate excel is kept.
+        # The slices stay in order, a slice is complete after slice_size points
+        ii, jj, kk = np.indices((self.nsl, self.nrow, self.ncol)).reshape(3, -1)
+        if not self.protocol.use_coord_excel:
+            jj = np.where(ii % 2 == 0, jj, self.nrow - 1 - jj)
+            kk = np.where((ii*self.nrow + jj) % 2 == 0, kk, self.ncol - 1 - kk)
+        grid_nr = (ii*self.nrow + jj)*self.ncol + kk  # position in cplx_data and outputRaw
+        scan_idx = np.stack((ii, jj, kk, grid_nr), axis=1).tolist()
+        scan_dest = scan_dest.tolist()
+
+        # methods used for every point, looked up once
+        logger = self.logger
+        debug = logger.isEnabledFor(logging.DEBUG)
+        move = self.motors.move
+        acquire_data = self.acquire_data
+        save_data = self.save_data
+        with ThreadPoolExecutor(max_workers=1) as worker:
+            for n, (i, j, k, m) in enumerate(scan_idx):
+                measur_nr, cluster_nr, indices_nr, row_nr, col_nr, sl_nr = scan_nrs[m]
+                relatXYZ = scan_relat[m]
+                destXYZ = scan_dest[m]
+
+                if debug:
+                    logger.debug('destXYZ: pos: %.3f, %.3f, %.3f', *destXYZ)
+                    logger.debug('i: %d, j: %d, k: %d, n: %d', i, j, k, n)
+                move(destXYZ, relative=False)
+                acquire_data()
+
+                # [Measurement nr, Cluster nr, indices nr, Xcor(mm), Ycor(mm), Zcor(mm), rowNr, colNr, SliceNr]
+                save_data(measur_nr, cluster_nr, indices_nr, relatXYZ, row_nr, col_nr, sl_nr, destXYZ,
+                          raw_row=m)
+
+                if (n + 1) % slice_size == 0:
+                    jobs.append(worker.submit(self.finish_slice, n + 1 - slice_size, n + 1,
+                                              slice_begs, slice_ends))
+
+        for job in jobs:
+            job.result()  # raises the exception of a failed job
+        self.close()
 
     def init_processing_parameters(self, begus=0.0, endus=0.0, adjust=0):
         self.adjust=adjust
@@ -671,110 +1093,105 @@ class Acquisition:
         self.begn = int(begus*1e-6*self.pico_sampling_freq) # begining of the processing window
         self.endn = int(endus*1e-6*self.pico_sampling_freq) # end of the processing window
         self.npoints = self.endn - self.begn
+        self.init_window_table()
         self.logger.debug(f'begus: {begus}, endus: {endus}, begn: {self.begn}, endn: {self.endn}')
 
     def save_params_ini(self, inputValues):
-        params = configparser.ConfigParser()
-        params['Versions'] = {}
-        params['Versions']['Equipment characterization pipeline software'] = self.config['Versions']['Equipment characterization pipeline software']
-
         # Get current date and time for logging
         date_time = datetime.now()
         timestamp = date_time.strftime('%Y-%m-%d_%H-%M-%S')
 
-        params['General'] = {}
-        params['General']['Timestamp'] = str(timestamp)
-        params['General']['Path and filename of protocol excel file'] = inputValues.path_protocol_excel_file
-        params['General']['Path of output'] = inputValues.dir_output
-        params['General']['Perform all protocols in sequence without waiting for user input?'] = str(inputValues.perform_all_protocols)
-        params['General']['Temperature of water [°C]'] = str(inputValues.temp)
-        params['General']['Dissolved oxygen level of water [mg/L]'] = str(inputValues.dis_oxy)
-
-        params['Equipment'] = {}
-        params['Equipment']['Driving system.serial_number'] = self.driving_system.serial
-        params['Equipment']['Driving system.name'] = self.driving_system.name
-        params['Equipment']['Driving system.manufact'] = self.driving_system.manufact
-        params['Equipment']['Driving system.available_ch'] = str(self.driving_system.available_ch)
-        params['Equipment']['Driving system.connect_info'] = self.driving_system.connect_info
-        params['Equipment']['Driving system.tran_comp'] = str(', '.join(self.driving_system.tran_comp))
-        params['Equipment']['Driving system.is_active'] = str(self.driving_system.is_active)
-
-        params['Equipment']['Transducer.serial_number'] = self.transducer.serial
-        params['Equipment']['Transducer.name'] = self.transducer.name
-        params['Equipment']['Transducer.manufact'] = self.transducer.manufact
-        params['Equipment']['Transducer.elements'] = str(self.transducer.elements)
-        params['Equipment']['Transducer.fund_freq'] = str(self.transducer.fund_freq)
-        params['Equipment']['Transducer.natural_foc'] = str(self.transducer.natural_foc)
-        params['Equipment']['Transducer.min_foc'] = str(self.transducer.min_foc)
-        params['Equipment']['Transducer.max_foc'] = str(self.transducer.max_foc)
-        params['Equipment']['Transducer.steer_info'] = self.transducer.steer_info
-        params['Equipment']['Transducer.is_active'] = str(self.transducer.is_active)
-
-        params['Equipment']['COM port of positioning system'] = inputValues.pos_com_port
-
-        params['Protocol'] = {}
-        params['Protocol']['Sequence number'] = str(self.protocol.seq_number)
-        params['Protocol']['Operating frequency [Hz]'] = str(self.protocol.oper_freq)
-        params['Protocol']['Focus [um]'] = str(self.protocol.focus)
-
-        params['Protocol']['Global power [mW] (NeuroFUS) or Amplitude [%] (IGT)'] = str(self.protocol.power_value)
-        params['Protocol']['Path of Isppa to Global power conversion excel'] = str(self.protocol.path_conv_excel)
-
-        params['Protocol']['Ramp mode (0 - rectangular, 1 - linear, 2 - tukey)'] = str(self.protocol.ramp_mode)
-        params['Protocol']['Ramp duration [us]'] = str(self.protocol.ramp_dur)
-        params['Protocol']['Ramp duration step size [us]'] = str(self.protocol.ramp_dur_step)
-
-        params['Protocol']['Pulse duration [us]'] = str(self.protocol.pulse_dur)
-        params['Protocol']['Pulse repetition interval [us]'] = str(self.protocol.pulse_rep_int)
-        params['Protocol']['Pulse train duration [us]'] = str(self.protocol.pulse_train_dur)
-
-        params['Grid'] = {}
-        params['Grid']['Absolute G code x-coordinate of relative zero [mm]'] = str(inputValues.coord_focus[0])
-        params['Grid']['Absolute G code y-coordinate of relative zero [mm]'] = str(inputValues.coord_focus[1])
-        params['Grid']['Absolute G code z-coordinate of relative zero [mm]'] = str(inputValues.coord_focus[2])
-        params['Grid']['Use coordinate excel as input?'] = str(self.protocol.use_coord_excel)
-        params['Grid']['Path of coordinate excel'] = str(self.protocol.path_coord_excel)
+        grid = {
+            'Absolute G code x-coordinate of relative zero [mm]': inputValues.coord_focus[0],
+            'Absolute G code y-coordinate of relative zero [mm]': inputValues.coord_focus[1],
+            'Absolute G code z-coordinate of relative zero [mm]': inputValues.coord_focus[2],
+            'Use coordinate excel as input?': self.protocol.use_coord_excel,
+            'Path of coordinate excel': self.protocol.path_coord_excel
+            }
 
         if self.protocol.use_coord_excel:
-            params['Grid']['Number of slices, rows, columns (z-dir, x-dir, y-dir)'] = str(self.protocol.nslices_nrow_ncol)
+            grid['Number of slices, rows, columns (z-dir, x-dir, y-dir)'] = self.protocol.nslices_nrow_ncol
         else:
-            params['Grid']['Begin coordinates [mm]'] = str(self.protocol.coord_begin)
-
-            sl_dir = np.nonzero(self.protocol.vectSl)[0][0]
-            row_dir = np.nonzero(self.protocol.vectRow)[0][0]
-            col_dir = np.nonzero(self.protocol.vectCol)[0][0]
-
-            dirInfo = [ [sl_dir, self.protocol.nslices_nrow_ncol[0]] , [row_dir, self.protocol.nslices_nrow_ncol[1]], [col_dir, self.protocol.nslices_nrow_ncol[2] ]]
-
-            direction = '('
-            for row in dirInfo:
-                if row[0] == 0:
-                    add_dir = 'x'
-                elif row[0] == 1:
-                    add_dir = 'y'
-                elif row[0] == 2:
-                    add_dir = 'z'
-                else:
-                    add_dir = 'unknown'
-                direction = direction + add_dir + '-dir '
+            grid['Begin coordinates [mm]'] = self.protocol.coord_begin
+
+            direction = gridDirection(self.protocol.vectSl, self.protocol.vectRow, self.protocol.vectCol)
+
+            grid['Number of slices, rows, columns ' + direction] = self.protocol.nslices_nrow_ncol
+
+            grid['Slice vector [mm]'] = self.protocol.vectSl
+            grid['Row vector [mm]'] = self.protocol.vectRow
+            grid['Column vector [mm]'] = self.protocol.vectCol
+
+        # All sections are assigned at once
+        sections = {
+            'Versions': {
+                'Equipment characterization pipeline software': self.config['Versions']['Equipment characterization pipeline software']
+                },
+            'General': {
+                'Timestamp': timestamp,
+                'Path and filename of protocol excel file': inputValues.path_protocol_excel_file,
+                'Path of output': inputValues.dir_output,
+                'Perform all protocols in sequence without waiting for user input?': inputValues.perform_all_protocols,
+                'Temperature of water [°C]': inputValues.temp,
+                'Dissolved oxygen level of water [mg/L]': inputValues.dis_oxy
+                },
+            'Equipment': {
+                'Driving system.serial_number': self.driving_system.serial,
+                'Driving system.name': self.driving_system.name,
+                'Driving system.manufact': self.driving_system.manufact,
+                'Driving system.available_ch': self.driving_system.available_ch,
+                'Driving system.connect_info': self.driving_system.connect_info,
+                'Driving system.tran_comp': ', '.join(self.driving_system.tran_comp),
+                'Driving system.is_active': self.driving_system.is_active,
+
+                'Transducer.serial_number': self.transducer.serial,
+                'Transducer.name': self.transducer.name,
+                'Transducer.manufact': self.transducer.manufact,
+                'Transducer.elements': self.transducer.elements,
+                'Transducer.fund_freq': self.transducer.fund_freq,
+                'Transducer.natural_foc': self.transducer.natural_foc,
+                'Transducer.min_foc': self.transducer.min_foc,
+                'Transducer.max_foc': self.transducer.max_foc,
+                'Transducer.steer_info': self.transducer.steer_info,
+                'Transducer.is_active': self.transducer.is_active,
+
+                'COM port of positioning system': inputValues.pos_com_port
+                },
+            'Protocol': {
+                'Sequence number': self.protocol.seq_number,
+                'Operating frequency [Hz]': self.protocol.oper_freq,
+                'Focus [um]': self.protocol.focus,
 
-            direction = direction + ')'
+                'Global power [mW] (NeuroFUS) or Amplitude [%] (IGT)': self.protocol.power_value,
+                'Path of Isppa to Global power conversion excel': self.protocol.path_conv_excel,
 
-            params['Grid']['Number of slices, rows, columns ' + direction] = str(self.protocol.nslices_nrow_ncol)
+                'Ramp mode (0 - rectangular, 1 - linear, 2 - tukey)': self.protocol.ramp_mode,
+                'Ramp duration [us]': self.protocol.ramp_dur,
+                'Ramp duration step size [us]': self.protocol.ramp_dur_step,
 
-            params['Grid']['Slice vector [mm]'] = str(self.protocol.vectSl)
-            params['Grid']['Row vector [mm]'] = str(self.protocol.vectRow)
-            params['Grid']['Column vector [mm]'] = str(self.protocol.vectCol)
+                'Pulse duration [us]': self.protocol.pulse_dur,
+                'Pulse repetition interval [us]': self.protocol.pulse_rep_int,
+                'Pulse train duration [us]': self.protocol.pulse_train_dur
+                },
+            'Grid': grid,
+            'Picoscope': {
+                'Picoscope sampling frequency multiplication factor': inputValues.sampl_freq_multi,
+                'Sampling frequency [Hz]': self.pico_sampling_freq,
+                'Hydrophone acquisition time [us]': self.sampling_duration_us,
+                'Amount of samples per acquisition': int(self.sample_count)
+                }
+            }
 
-        params['Picoscope'] = {}
-        params['Picoscope']['Picoscope sampling frequency multiplication factor'] = str(inputValues.sampl_freq_multi)
-        params['Picoscope']['Sampling frequency [Hz]'] = str(self.pico_sampling_freq)
-        params['Picoscope']['Hydrophone acquisition time [us]'] = str(self.sampling_duration_us)
-        params['Picoscope']['Amount of samples per acquisition'] = str(int(self.sample_count))
+        # written in one pass, in the same layout as ConfigParser.write (keys in lower case)
+        lines = []
+        for section, options in sections.items():
+            lines.append(f'[{section}]\n')
+            lines.extend(f'{key.lower()} = {value}\n' for key, value in options.items())
+            lines.append('\n')
 
         config_fold = self.config['General']['Configuration file folder']
         with open(os.path.join(config_fold, self.outputINI), 'w') as configfile:
-            params.write(configfile)
+            configfile.writelines(lines)
 
     def save_params_json(self):
         """
@@ -828,54 +1245,36 @@ class Acquisition:
         """
         scan without moving the motors (mostly for debugging)
         """
-        self.cplx_data = np.zeros((2, self.nsl, self.nrow, self.ncol), dtype='float32')
-
-        counter = 0
-        for i in range(self.nsl):
-            for j in range(self.nrow):
-                for k in range(self.ncol):
-
-                    if self.protocol.use_coord_excel:
-                        measur_nr = self.coord_excel_data.loc[counter, "Measurement number"]
-                        cluster_nr = self.coord_excel_data.loc[counter, "Cluster number"]
-                        indices_nr = self.coord_excel_data.loc[counter, "Indices number"]
-                        relatXYZ = [self.coord_excel_data.loc[counter, "X-coordinate [mm]"],
-                                    self.coord_excel_data.loc[counter, "Y-coordinate [mm]"],
-                                    self.coord_excel_data.loc[counter, "Z-coordinate [mm]"]]
-                        destXYZ = [relatXYZ[0] + coord_focus[0], relatXYZ[1] + coord_focus[1],
-                                   relatXYZ[2] + coord_focus[2]]
-                        row_nr = self.coord_excel_data.loc[counter, "Row number"]
-                        col_nr = self.coord_excel_data.loc[counter, "Column number"]
-                        sl_nr = self.coord_excel_data.loc[counter, "Slice number"]
-
-                    else:
-                        measur_nr = counter + 1
-                        cluster_nr = 1
-                        indices_nr = measur_nr
-                        destXYZ = (self.starting_pos + i*self.vectSl + j*self.vectCol
-                                   + k*self.vectRow)
-                        relatXYZ = [destXYZ[0] - coord_focus[0], destXYZ[1] - coord_focus[1],
-                                    destXYZ[2] - coord_focus[2]]
-                        row_nr = j
-                        col_nr = k
-                        sl_nr = i
-
-                    self.acquire_data()
-
-                    # [Measurement nr, Cluster nr, indices nr, Xcor(mm), Ycor(mm), Zcor(mm), rowNr,
-                    # colNr, SliceNr, destXYZ]
-                    self.save_data(measur_nr, cluster_nr, indices_nr, relatXYZ, row_nr,
-                                   col_nr, sl_nr, destXYZ)
-
-                    a, p = self.process_data(beg=0, end=int(self.sample_count//2))
-                    self.cplx_data[0, i, j, k] = a
-                    self.cplx_data[1, i, j, k] = p
-                    time.sleep(0.05)
-
-                    counter = counter + 1
-
-        with open(self.outputACD, 'wb') as outacd:
-            self.cplx_data.tofile(outacd)
+        self.open_acd_output()
+        scan_nrs, scan_relat, scan_dest = self.init_scan_coord(coord_focus)
+        self.open_raw_output()
+
+        # a complete slice is flushed and processed by a worker thread, while the scan goes on
+        slice_size = self.nrow*self.ncol
+        slice_begs, slice_ends = self.slice_windows(0, self.sample_count//2)
+        jobs = []
+
+        with ThreadPoolExecutor(max_workers=1) as worker:
+            for n in range(self.nsl*self.nrow*self.ncol):
+                measur_nr, cluster_nr, indices_nr, row_nr, col_nr, sl_nr = scan_nrs[n]
+                relatXYZ = scan_relat[n]
+                destXYZ = scan_dest[n]
+
+                self.acquire_data()
+
+                # [Measurement nr, Cluster nr, indices nr, Xcor(mm), Ycor(mm), Zcor(mm), rowNr,
+                # colNr, SliceNr, destXYZ]
+                self.save_data(measur_nr, cluster_nr, indices_nr, relatXYZ, row_nr,
+                               col_nr, sl_nr, destXYZ)
+
+                if (n + 1) % slice_size == 0:
+                    jobs.append(worker.submit(self.finish_slice, n + 1 - slice_size, n + 1,
+                                              slice_begs, slice_ends))
+                time.sleep(0.05)
+
+        for job in jobs:
+            job.result()  # raises the exception of a failed job
+        self.close()
 
     def pulse_only(self, performAllProtocols, repetitions=1, delay_s=1.0, log_dir=''):
         """
@@ -898,20 +1297,19 @@ class Acquisition:
         """
         self.logger.debug(f'scan: {scan}')
         self.init_scan(scan=scan)
-        t0 = time.time()
 
-        counter = 0
-        for s, r, c in self.grid:
-            if self.protocol.use_coord_excel:
-                destXYZ = [self.coord_excel_data.loc[counter, "X-coordinate [mm]"] + coord_focus[0],
-                           self.coord_excel_data.loc[counter, "Y-coordinate [mm]"] + coord_focus[1],
-                           self.coord_excel_data.loc[counter, "Z-coordinate [mm]"] + coord_focus[2]]
-            else:
-                destXYZ = self.starting_pos + s*self.vectSl + r*self.vectCol + c*self.vectRow
+        # all [slice, row, column] indices and positions in scanning order
+        src = np.array(list(self.grid), dtype=int).reshape(-1, 3)
+        if self.protocol.use_coord_excel:
+            _, _, dest = self.init_scan_coord(coord_focus)
+        else:
+            dest = self.grid_coord[src[:, 0], src[:, 1], src[:, 2]]
 
-            self.logger.info(f'src: [{s}, {r}, {c}], destXYZ: {destXYZ[0]:.3f}, {destXYZ[1]:.3f}, {destXYZ[2]:.3f}')
-            self.motors.move(list(destXYZ), relative=False)
-            counter = counter + 1
+        t0 = time.time()
+
+        for (s, r, c), destXYZ in zip(src.tolist(), dest.tolist()):
+            self.logger.info('src: [%d, %d, %d], destXYZ: %.3f, %.3f, %.3f', s, r, c, *destXYZ)
+            self.motors.move(destXYZ, relative=False)
 
         # time.sleep(delay_s)
         t1 = time.time()
@@ -924,125 +1322,171 @@ class Acquisition:
         save the acquisition params into outputJSON
         """
 
-        acqs_params = configparser.ConfigParser()
-        acqs_params.read(filepath)
-
-        self.driving_system.serial = acqs_params['Equipment']['Driving system.serial_number']
-        self.driving_system.name = acqs_params['Equipment']['Driving system.name']
-        self.driving_system.manufact = acqs_params['Equipment']['Driving system.manufact']
-        self.driving_system.available_ch = int(acqs_params['Equipment']['Driving system.available_ch'])
-        self.driving_system.connect_info = acqs_params['Equipment']['Driving system.connect_info']
-        self.driving_system.tran_comp = acqs_params['Equipment']['Driving system.tran_comp'].split(', ')
-        self.driving_system.is_active = (acqs_params['Equipment']['Driving system.is_active'] == 'True')
+        # no interpolation is used in the saved files, and keys are already stored in lower case
+        # by save_params_ini, so they are used as they are
+        acqs_params = configparser.RawConfigParser()
+        acqs_params.optionxform = str
+        # read the whole file at once, with the same (default) encoding as save_params_ini
+        with open(filepath, 'r') as configfile:
+            acqs_params.read_string(configfile.read(), source=filepath)
+
+        # one pass over the stored values instead of a parser lookup per key
+        for section in acqs_params.sections():
+            for key, value in acqs_params.items(section):
+                field = _INI_FIELDS.get((section, key))
+                if field is not None:
+                    target, attr, conv = field
+                    try:
+                        value = conv(value)
+                    except ValueError as err:
+                        raise ValueError(f"Invalid value '{value}' for key '{key}' in section [{section}] of {filepath}") from err
+                    setattr(getattr(self, target) if target else self, attr, value)
+        self.set_sampling_freq(self.pico_sampling_freq)
+
+        grid = dict(acqs_params.items('Grid'))
 
-        self.transducer.serial = acqs_params['Equipment']['Transducer.serial_number']
-        self.transducer.name = acqs_params['Equipment']['Transducer.name']
-        self.transducer.manufact = acqs_params['Equipment']['Transducer.manufact']
-        self.transducer.elements = int(acqs_params['Equipment']['Transducer.elements'])
-        self.transducer.fund_freq = int(acqs_params['Equipment']['Transducer.fund_freq'])
-        self.transducer.natural_foc = float(acqs_params['Equipment']['Transducer.natural_foc'])
-        self.transducer.min_foc = float(acqs_params['Equipment']['Transducer.min_foc'])
-        self.transducer.max_foc = float(acqs_params['Equipment']['Transducer.max_foc'])
-        self.transducer.steer_info = acqs_params['Equipment']['Transducer.steer_info']
-        self.transducer.is_active = (acqs_params['Equipment']['Transducer.is_active'] == 'True')
-
-        self.protocol.seq_number = int(acqs_params['Protocol']['Sequence number'])
-        self.protocol.oper_freq = int(acqs_params['Protocol']['Operating frequency [Hz]'])
-        self.protocol.focus = int(acqs_params['Protocol']['Focus [um]'])
-
-        self.protocol.power_value = float(acqs_params['Protocol']['Global power [mW] (NeuroFUS) or Amplitude [%] (IGT)'])
-        self.protocol.path_conv_excel = str(acqs_params['Protocol']['Path of Isppa to Global power conversion excel'])
+        if self.protocol.use_coord_excel:
 
-        self.protocol.ramp_mode = int(acqs_params['Protocol']['Ramp mode (0 - rectangular, 1 - linear, 2 - tukey)'])
-        self.protocol.ramp_dur = float(acqs_params['Protocol']['Ramp duration [us]'])
-        self.protocol.ramp_dur_step = float(acqs_params['Protocol']['Ramp duration step size [us]'])
+            array_str = grid['number of slices, rows, columns (z-dir, x-dir, y-dir)']
+            self.protocol.nslices_nrow_ncol = _parse_vec(array_str, dtype=int).tolist()
 
-        self.protocol.pulse_dur = float(acqs_params['Protocol']['Pulse duration [us]'])
-        self.protocol.pulse_rep_int = float(acqs_params['Protocol']['Pulse repetition interval [us]'])
-        self.protocol.pulse_train_dur = float(acqs_params['Protocol']['Pulse train duration [us]'])
+            self.nsl = self.protocol.nslices_nrow_ncol[0]
+            self.nrow = self.protocol.nslices_nrow_ncol[1]
+            self.ncol = self.protocol.nslices_nrow_ncol[2]
 
-        self.protocol.use_coord_excel = (acqs_params['Grid']['Use coordinate excel as input?'] == 'True')
-        self.protocol.path_coord_excel = str(acqs_params['Grid']['Path of coordinate excel'])
+        else:
+            self.protocol.coord_begin = _parse_vec(grid['begin coordinates [mm]'])
 
-        if self.protocol.use_coord_excel:
+            self.protocol.vectSl = _parse_vec(grid['slice vector [mm]'])
+            self.protocol.vectRow = _parse_vec(grid['row vector [mm]'])
+            self.protocol.vectCol = _parse_vec(grid['column vector [mm]'])
 
-            array_str = acqs_params['Grid']['Number of slices, rows, columns (z-dir, x-dir, y-dir)']
-            strip_split_array = array_str.replace('[', '').replace(']', '').strip().split(',')
+            direction = gridDirection(self.protocol.vectSl, self.protocol.vectRow, self.protocol.vectCol)
 
-            self.protocol.nslices_nrow_ncol = [int(num) for num in strip_split_array]
+            array_str = grid['number of slices, rows, columns ' + direction]
+            self.protocol.nslices_nrow_ncol = _parse_vec(array_str, dtype=int).tolist()
 
             self.nsl = self.protocol.nslices_nrow_ncol[0]
             self.nrow = self.protocol.nslices_nrow_ncol[1]
             self.ncol = self.protocol.nslices_nrow_ncol[2]
 
+
+def _parse_vec(array_str, dtype=float):
+    """
+    parse a vector saved in an ini file, either as a list '[1.0, 2.0, 3.0]' or as a numpy array
+    '[1. 2. 3.]', into a numpy array
+    """
+    return np.fromstring(array_str.strip().strip('[]').replace(',', ' '), dtype=dtype, sep=' ')
+
+
+# parsed transducer phase files, keyed on path, modification time and number of channels
+_PHASE_TABLES = {}
+
+
+def loadPhaseTable(excel_path, channels):
+    """
+    return a dictionary focal distance [mm] -> phases (float32 array) and the set of duplicate distances
+    of a transducer phases file. The file is parsed once and reused until it is modified.
+    """
+    key = (excel_path, os.path.getmtime(excel_path), channels)
+    if key not in _PHASE_TABLES:
+        data = pd.read_excel(excel_path, engine='openpyxl')
+
+        phase_table = {}
+        duplicates = set()
+        for distance, phases in zip(data['Distance'], data.iloc[:, 1:channels+1].to_numpy()):
+            distance = round(float(distance), 1)
+            if distance in phase_table:
+                duplicates.add(distance)
+            phase_table[distance] = phases.astype(np.float32)
+
+        _PHASE_TABLES[key] = (phase_table, duplicates)
+
+    return _PHASE_TABLES[key]
+
+
+# parsed coordinate files, keyed on path and modification time
+_COORD_TABLES = {}
+
+
+def loadCoordTable(excel_path, logger):
+    """
+    return the content of a coordinate file (.csv or excel) as a DataFrame. The file is parsed
+    once and reused until it is modified, the DataFrame must not be modified.
+    """
+    key = (excel_path, os.path.getmtime(excel_path))
+    if key not in _COORD_TABLES:
+        path, ext = os.path.splitext(excel_path)
+
+        # parquet copy of an excel file, only used when pyarrow is available
+        parquet_path = excel_path + '.parquet'
+
+        # only the coordinate columns are parsed, directly into their final type
+        if ext == '.csv':
+            data = pd.read_csv(excel_path, usecols=COORD_COLUMNS, dtype=COORD_DTYPES,
+                               engine='pyarrow' if pyarrow is not None else 'c')
+        elif (pyarrow is not None and os.path.exists(parquet_path)
+              and os.path.getmtime(parquet_path) >= key[1]):
+            data = pd.read_parquet(parquet_path, columns=COORD_COLUMNS)
         else:
-            self.protocol.coord_begin = np.array(acqs_params['Grid']['Begin coordinates [mm]'])
-
-            self.protocol.vectSl = np.array(acqs_params['Grid']['Slice vector [mm]'])
-            self.protocol.vectRow = np.array(acqs_params['Grid']['Row vector [mm]'])
-            self.protocol.vectCol = np.array(acqs_params['Grid']['Column vector [mm]'])
-
-            sl_dir = np.nonzero(self.protocol.vectSl)[0][0]
-            row_dir = np.nonzero(self.protocol.vectRow)[0][0]
-            col_dir = np.nonzero(self.protocol.vectCol)[0][0]
-
-            direction = '('
-            for num_dir in [sl_dir, row_dir, col_dir]:
-                if num_dir == 0:
-                    add_dir = 'x'
-                elif num_dir == 1:
-                    add_dir = 'y'
-                elif num_dir == 2:
-                    add_dir = 'z'
-                else:
-                    add_dir = 'unknown'
-                direction = direction + add_dir + '-dir '
+            # without calamine, pandas selects the engine (openpyxl for .xlsx) based on the extension
+            data = pd.read_excel(excel_path, usecols=COORD_COLUMNS, dtype=COORD_DTYPES,
+                                 engine='calamine' if python_calamine is not None else None)
 
-            direction = direction + ')'
+            if pyarrow is not None:
+                try:
+                    data.to_parquet(parquet_path)
+                except OSError:
+                    logger.warning(f'Parquet copy of {excel_path} cannot be saved')
 
-            array_str = acqs_params['Grid']['Number of slices, rows, columns ' + direction]
-            strip_split_array = array_str.replace('[', '').replace(']', '').strip().split(',')
+        _COORD_TABLES[key] = data
 
-            self.protocol.nslices_nrow_ncol = [int(num) for num in strip_split_array]
+    return _COORD_TABLES[key]
 
-            self.nsl = self.protocol.nslices_nrow_ncol[0]
-            self.nrow = self.protocol.nslices_nrow_ncol[1]
-            self.ncol = self.protocol.nslices_nrow_ncol[2]
 
-        self.pico_sampling_freq = float(acqs_params['Picoscope']['Sampling frequency [Hz]'])
-        self.sampling_period = 1.0/self.pico_sampling_freq
+@functools.lru_cache(maxsize=32)
+def getRampModulation(ramp_mode, ramp_dur, myStepDurationMs):
+    """
+    return the (rampUp, rampDown) pulse modulation values as tuples of attenuation in percent
+    results are cached, since they only depend on the ramping parameters
+    """
+    aRamp = getRampingAmplitude(ramp_mode, ramp_dur, myStepDurationMs)
+    maxAmpl = 100  # %
+
+    # Note: ramp up and ramp down order are the other way around
+    # ramp up descends, ramp down ascends
+    rampDown = tuple((aRamp * maxAmpl).astype(np.int32).tolist())
+    rampUp = tuple((np.flip(aRamp) * maxAmpl).astype(np.int32).tolist())
 
-        self.sampling_duration_us = float(acqs_params['Picoscope']['Hydrophone acquisition time [us]'])
-        self.sample_count = int(acqs_params['Picoscope']['Amount of samples per acquisition'])
+    return rampUp, rampDown
 
 
+@functools.lru_cache(maxsize=32)
 def getRampingAmplitude(ramp_mode, ramp_dur, myStepDurationMs):
+    """
+    return the ramping amplitude (0..1) for the given ramping mode and duration
+    the result is cached and read-only, copy it before modifying it
+    """
     match ramp_mode:
         case 1:  # Linear ramping
             # amount of points where ramping is applied
-            nPoints = math.floor(ramp_dur/myStepDurationMs)
+            nPoints = int(ramp_dur // myStepDurationMs)
             aRamp = np.linspace(0, 1, nPoints)
         case 2:  # Tukey ramping
             # amount of points where ramping is applied
-            nPoints = math.floor(ramp_dur/myStepDurationMs)
+            nPoints = int(ramp_dur // myStepDurationMs)
             alpha = 1
             x = np.linspace(0, alpha/2, nPoints)
-            aRamp = np.zeros(nPoints)
-            for i in range(nPoints):
-                aRamp[i] = 0.5 * (1 + math.cos((2*math.pi/alpha) * (x[i] - alpha/2)))
+            aRamp = 0.5 * (1 + np.cos((2*np.pi/alpha) * (x - alpha/2)))
 
+    aRamp.flags.writeable = False
     return aRamp
 
 
-def acquire(outfile, protocol, config, inputParam):
+def _prepare_acquisition(protocol, config, inputParam, outfile=None, grid=True):
     """
-    perform the entire acquisition process:
-        check file output
-        initialize the grid to be scanned
-        initialize the generator and prepare the pulse sequence
-        initialize the motor system
-        prepare acquisition and processing
-        scan and acquire the data
+    create an Acquisition for the protocol with the used driving system and transducer,
+    check the output file when given and initialize the grid to be scanned when grid is True
     """
     my_acquisition = Acquisition(config)
 
@@ -1050,13 +1494,31 @@ def acquire(outfile, protocol, config, inputParam):
     my_acquisition.protocol = protocol
     my_acquisition.driving_system = inputParam.driving_system
     my_acquisition.transducer = inputParam.transducer
+    my_acquisition.armed_delay_s = inputParam.armed_delay_us*1e-6
+
+    if outfile is not None:
+        my_acquisition.check_file(outfile)
+
+    if grid:
+        if protocol.use_coord_excel:
+            my_acquisition.init_grid_excel()
+        else:
+            my_acquisition.init_grid()
+
+    return my_acquisition
 
-    my_acquisition.check_file(outfile)
 
-    if protocol.use_coord_excel:
-        my_acquisition.init_grid_excel()
-    else:
-        my_acquisition.init_grid()
+def acquire(outfile, protocol, config, inputParam):
+    """
+    perform the entire acquisition process:
+        check file output
+        initialize the grid to be scanned
+        initialize the generator and prepare the pulse sequence
+        initialize the motor system
+        prepare acquisition and processing
+        scan and acquire the data
+    """
+    my_acquisition = _prepare_acquisition(protocol, config, inputParam, outfile)
 
     my_acquisition.logger.info('Grid is initialized')
 
@@ -1096,19 +1558,7 @@ def simul_acquire(outfile, protocol, config, inputParam):
         prepare acquisition and processing
         save the acquisition parameters
     """
-    my_acquisition = Acquisition(config)
-
-    # Save protocol, config, used driving system and used transducer
-    my_acquisition.protocol = protocol
-    my_acquisition.driving_system = inputParam.driving_system
-    my_acquisition.transducer = inputParam.transducer
-
-    my_acquisition.check_file(outfile)
-
-    if protocol.use_coord_excel:
-        my_acquisition.init_grid_excel()
-    else:
-        my_acquisition.init_grid()
+    my_acquisition = _prepare_acquisition(protocol, config, inputParam, outfile)
 
     try:
         my_acquisition.init_generator(inputParam.perform_all_protocols, inputParam.main_dir)
@@ -1125,17 +1575,7 @@ def check_scan(protocol, config, inputParam, scan='Dir'):
     """
     perform a scan of the defined grid to check scanning path
     """
-    my_acquisition = Acquisition(config)
-
-    # Save protocol, config, used driving system and used transducer
-    my_acquisition.protocol = protocol
-    my_acquisition.driving_system = inputParam.driving_system
-    my_acquisition.transducer = inputParam.transducer
-
-    if protocol.use_coord_excel:
-        my_acquisition.init_grid_excel()
-    else:
-        my_acquisition.init_grid()
+    my_acquisition = _prepare_acquisition(protocol, config, inputParam)
 
     try:
         # determine the COM port used by the motors using the Device manager
@@ -1155,12 +1595,7 @@ def check_generator(protocol, config, inputParam, repetitions=1, delay_s=1.0):
     This is use dtho check the picoscope settings with the chosen generator amplitude
     using the picoscope software
     """
-    my_acquisition = Acquisition(config)
-
-    # Save protocol, config, used driving system and used transducer
-    my_acquisition.protocol = protocol
-    my_acquisition.driving_system = inputParam.driving_system
-    my_acquisition.transducer = inputParam.transducer
+    my_acquisition = _prepare_acquisition(protocol, config, inputParam, grid=False)
 
     my_acquisition.pulse_only(inputParam.performAllProtocols, repetitions=repetitions,
                               delay_s=delay_s,
@@ -1177,19 +1612,7 @@ def check_acquisition(outfile, protocol, config, inputParam):
         acquire the data ncol x nrow number of time
         this is usefull to check acquisition parameters (picoscope) and processing
     """
-    my_acquisition = Acquisition(config)
-
-    # Save protocol, config, used driving system and used transducer
-    my_acquisition.protocol = protocol
-    my_acquisition.driving_system = inputParam.driving_system
-    my_acquisition.transducer = inputParam.transducer
-
-    my_acquisition.check_file(outfile)
-
-    if protocol.use_coord_excel:
-        my_acquisition.init_grid_excel()
-    else:
-        my_acquisition.init_grid()
+    my_acquisition = _prepare_acquisition(protocol, config, inputParam, outfile)
 
     try:
         my_acquisition.init_generator(inputParam.performAllProtocols, inputParam.main_dir)
@@ -1200,16 +1623,14 @@ def check_acquisition(outfile, protocol, config, inputParam):
         my_acquisition.init_processing()
         my_acquisition.scan_noMotion(inputParam.coord_focus)
     finally:
-        my_acquisition.close_all()
+        my_acquisition.close_all(close_scope=True)
 
 
-def determineCoordDir(dir_num):
-    coord_dir = 'unknown'
-    if dir_num == 0:
-        coord_dir = 'x'
-    elif dir_num == 1:
-        coord_dir = 'y'
-    elif dir_num == 2:
-        coord_dir = 'z'
-
-    return coord_dir
+def gridDirection(vectSl, vectRow, vectCol):
+    """
+    return the direction annotation of the grid ini key, e.g. '(z-dir x-dir y-dir )'
+    the direction of a vector is its first non-zero coordinate
+    """
+    nonzero = np.abs([vectSl, vectRow, vectCol]) > 0
+    dirs = np.where(nonzero.any(axis=1), np.argmax(nonzero, axis=1), len(_COORD_DIRS)).tolist()
+    return '(' + ''.join([_AXIS_LABELS[d] for d in dirs]) + ')'
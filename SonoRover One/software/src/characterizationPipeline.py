@@ -35,6 +35,7 @@ import os
 import sys
 import protocol
 import acquisition
+import pico
 import logging
 from datetime import datetime
 import input_parameters
@@ -134,17 +135,21 @@ def main():
         # Import protocols of excel
         protocol_list = importExcel(logger, inputValues)
 
-        for prot in protocol_list:
-            logger.info('Performing the following protocol: \n' + prot.info())
+        try:
+            for prot in protocol_list:
+                logger.info('Performing the following protocol: \n' + prot.info())
 
-            # Check existance of directory
-            outfile = os.path.join(inputValues.temp_dir_output, 'sequence_' + str(prot.seq_number)
-                                   + '_output_data.raw')
+                # Check existance of directory
+                outfile = os.path.join(inputValues.temp_dir_output, 'sequence_' + str(prot.seq_number)
+                                       + '_output_data.raw')
 
-            acquisition.acquire(outfile, prot, config, inputValues)
+                acquisition.acquire(outfile, prot, config, inputValues)
 
-            # Test functions
-            # acquisition.check_scan(prot, config, inputValues)
+                # Test functions
+                # acquisition.check_scan(prot, config, inputValues)
+        finally:
+            # the picoscope is kept open between protocols
+            pico.closeOpenScopes()
 
         # all protocols are finished, so move data
         try:
@@ -139,6 +139,7 @@ class InputParameters:
 
         self.acquisition_time = 500  # microseconds
         self.sampl_freq_multi = 50
+        self.armed_delay_us = 25000  # wait between arming the picoscope and starting the pulse sequence
 
         self.temp = ''  # temperature in celsius
         self.dis_oxy = ''  # dissolved oxygen in mg/L
@@ -180,6 +181,7 @@ class InputParameters:
 
         cached_input['Input parameters']['Hydrophone acquisition time [us]'] = str(self.acquisition_time)
         cached_input['Input parameters']['Picoscope sampling frequency multiplication factor'] = str(self.sampl_freq_multi)
+        cached_input['Input parameters']['Picoscope armed delay [us]'] = str(self.armed_delay_us)
 
         cached_input['Input parameters']['Temperature of water [°C]'] = str(self.temp)
         cached_input['Input parameters']['Dissolved oxygen level of water [mg/L]'] = str(self.dis_oxy)
@@ -225,6 +227,8 @@ class InputParameters:
 
         self.acquisition_time = float(cached_input['Input parameters']['Hydrophone acquisition time [us]'])
         self.sampl_freq_multi = float(cached_input['Input parameters']['Picoscope sampling frequency multiplication factor'])
+        self.armed_delay_us = float(cached_input['Input parameters'].get('Picoscope armed delay [us]',
+                                                                        self.armed_delay_us))
 
         self.temp = float(cached_input['Input parameters']['Temperature of water [°C]'])
         self.dis_oxy = float(cached_input['Input parameters']['Dissolved oxygen level of water [mg/L]'])
@@ -264,6 +268,7 @@ class InputParameters:
         info = info + f"COM port of positioning system: {self.pos_com_port} \n "
         info = info + f"Hydrophone acquisition time [us]: {self.acquisition_time} \n "
         info = info + f"Picoscope sampling frequency multiplication factor: {self.sampl_freq_multi} \n "
+        info = info + f"Picoscope armed delay [us]: {self.armed_delay_us} \n "
 
         info = info + f"Temperature of water [°C]: {self.temp} \n "
         info = info + f"Dissolved oxygen level of water [mg/L]: {self.dis_oxy} \n "
@@ -862,6 +862,7 @@ class Scope(object):
         self.channelSettings = None  # only contains settings for channels A to D (channelCount), not EXT or GEN
         self.extSettings = None      # settings for EXT channel only
         self.acquisitionSettings = None
+        self._sampleBuffers = None   # int16 buffers reused by readVolts()
 
 
     def _clearSettings (self):
@@ -990,6 +991,14 @@ class Scope(object):
         return infos
 
 
+    def pingUnit (self):
+        """Returns True if the open unit responds."""
+        if self.model.handle is None:
+            return False
+        #ps????PingUnit(int16_t handle)
+        return self._func("PingUnit") (self.model.handle) == Status.PICO_OK
+
+
     def closeUnit (self):
         """Closes the unit."""
         if self.model.handle is None:
@@ -1318,20 +1327,25 @@ class Scope(object):
         raise NotImplementedError("_getValues() must be implemented")
 
 
-    def readSamples (self):
+    def readSamples (self, buffers=None):
         """
         Returns the samples from the last terminated acquisition.
 
+        :param list buffers: optional list of channelCount() int16 arrays of sampleCount samples,
+            filled in place instead of allocating new arrays (None entries are allocated).
         :return: a list of channelCount() buffers (always the same size no matter how many channels are enabled).
             Each item is either None if the corresponding channel is disabled, or a numpy array of 16-bits integers (ADC values).
         """
         if self.acquisitionSettings.sampleCount is None:
             return [ None for _ in range(self.model.channelCount) ]
-        buffers = []
         sampleCount = self.acquisitionSettings.sampleCount
+        given = buffers
+        buffers = []
         for cset in self.channelSettings:
             if cset.enabled:
-                buf = numpy.zeros(sampleCount, dtype=numpy.int16)  #c_int16(0) * sampleCount
+                buf = given[cset.channel] if given is not None else None
+                if buf is None or len(buf) != sampleCount:
+                    buf = numpy.zeros(sampleCount, dtype=numpy.int16)  #c_int16(0) * sampleCount
                 self._setBuffer(cset.channel, buf)
             else:
                 buf = None
@@ -1369,32 +1383,41 @@ class Scope(object):
         return self.ADCToVoltsForRange (array, vRange)
 
 
-    def ADCToVoltsForRange (self, array, vRange):
+    def ADCToVoltsForRange (self, array, vRange, out=None):
         """
         Returns an array or a value converted into Volts.
 
         :param array: value or array of ADC values, as returned by readSamples() for example.
         :param Pico.Range vRange: range used to acquire those values, as specified in openChannel().
+        :param out: optional float32 array receiving the result in place.
         :return: array converted into Volts.
         """
         if not (vRange in Range.UPPER_BOUND):
             raise PicoError("ADCToVoltsForRange(): invalid range (%s)" % str(vRange))
 ##        return array * (Range.UPPER_BOUND[vRange] / float(self.model.maxADC))
-        return array * numpy.float32(Range.UPPER_BOUND[vRange] / float(self.model.maxADC)) # ED: no reason for float64
+        scale = numpy.float32(Range.UPPER_BOUND[vRange] / float(self.model.maxADC)) # ED: no reason for float64
+        if out is None:
+            return array * scale
+        return numpy.multiply(array, scale, out=out)
 
 
-    def readVolts (self):
+    def readVolts (self, out=None):
         """
         Returns the samples from the last terminated acquisition.
 
+        :param list out: optional list of float32 arrays, indexed by channel, receiving the Volt values in place
+            (missing or None entries are allocated).
         :return: list of buffers, one per channel enabled.
             Each buffer is a numpy array of floats (Volt values).
         """
-        buffers = self.readSamples()
+        # the ADC values are converted right away, so the int16 buffers can be reused between calls
+        buffers = self.readSamples(self._sampleBuffers)
+        self._sampleBuffers = buffers
         buffersV = []
         for cset in self.channelSettings:
             if cset.enabled:
-                bufV = self.ADCToVoltsForRange (buffers[cset.channel], cset.range)
+                dst = out[cset.channel] if out is not None and cset.channel < len(out) else None
+                bufV = self.ADCToVoltsForRange (buffers[cset.channel], cset.range, dst)
             else:
                 bufV = None
             buffersV.append(bufV)
@@ -1784,3 +1807,35 @@ def getScope(modelName):
     elif modelName.startswith("5244"):
         return Scope5244D()
     raise PicoError("Unsupported model (%s)." % modelName)
+
+
+# Opened scopes per model name, reused by getOpenScope()
+_OPEN_SCOPES = {}
+
+def getOpenScope(modelName, resolution=None):
+    """
+    Returns an opened instance of the Scope object for the requested model.
+    The unit is opened on the first call and the same instance is returned on later calls,
+    so that consecutive acquisitions do not have to close and reopen the unit.
+
+    :param modelName: usually a string, but can be a number if not ambiguous.
+    :param resolution: one of Resolution.DR_*, applied if the open unit uses another one.
+    :return: an instance of the corresponding Scope object, with an open unit.
+    :raise: a PicoError if the model is not supported or the unit can not be opened.
+    """
+    scope = _OPEN_SCOPES.get(modelName)
+    if scope is None:
+        scope = getScope(modelName)
+        _OPEN_SCOPES[modelName] = scope
+
+    if scope.model.handle is None:
+        scope.openUnit(resolution)
+    elif resolution is not None and scope.resolution() != resolution:
+        scope.setResolution(resolution)
+    return scope
+
+def closeOpenScopes():
+    """Closes all units opened by getOpenScope()."""
+    for scope in _OPEN_SCOPES.values():
+        scope.closeUnit()
+    _OPEN_SCOPES.clear()
@@ -35,6 +35,10 @@ import time
 import re
 import sys
 
+def decodeAck(line):
+    # strip the line terminator on the bytes, then decode once; stray bytes are replaced
+    return line.strip().decode("ascii", "replace")
+
 class tpoCommunication():
     def __init__(self, logger_name, tpo):
         self.logger = logging.getLogger(logger_name)
@@ -44,14 +48,49 @@ class tpoCommunication():
         self.tpo.write(command.encode("ascii"))
         self.logger.info(f"Sent to TPO: {command.strip()}")
         time.sleep(sleep_time_s)
-        response = self.tpo.readline().decode("ascii").rstrip()
-        self.logger.info("Response from TPO: %response", response)
+        response = decodeAck(self.tpo.readline())
+        self.logger.info("Response from TPO: %s", response)
     
         if response == 'E2':
             self.logger.error("Error E2")
             sys.exit()
     
         return response
+
+    def sendCommands(self, commands, sleep_time_s = 1):
+        # Write all commands in one go and collect one response per command
+        self.tpo.write("".join(commands).encode("ascii"))
+        self.logger.info("Sent to TPO: %s", ' '.join(command.strip() for command in commands))
+
+        responses = []
+        for n, command in enumerate(commands):
+            # readline is bounded by the timeout of the serial port
+            response = decodeAck(self.tpo.readline())
+            self.logger.info("Response from TPO: %s", response)
+
+            if response == 'E2':
+                self.logger.error("Error E2 after command %s", command.strip())
+                sys.exit()
+
+            if not response:
+                # No acknowledgement within the timeout: a late response would be paired with
+                # the next command. Let the TPO settle, drop the late responses and send this
+                # and the remaining commands one by one.
+                self.logger.warning("No response from TPO after command %s, "
+                                    "sending the remaining commands one by one", command.strip())
+                time.sleep(sleep_time_s)
+                self.tpo.reset_input_buffer()
+                for command in commands[n:]:
+                    response = self.sendCommand(command, sleep_time_s)
+                    if not response:
+                        self.logger.error("No response from TPO after command %s", command.strip())
+                        sys.exit()
+                    responses.append(response)
+                break
+
+            responses.append(response)
+
+        return responses
     
     def resetParameters(self):
         # Make sure TPO is not in advanced mode
@@ -77,6 +116,13 @@ class tpoCommunication():
         command = f'FOCUS={focus}\r\n'
         self.sendCommand(command)
         
+    def setFreqFocusAndPower(self, oper_freq, focus, global_power):
+        # Set operating frequency, focus and global power in one batch
+        commands = [f'GLOBALFREQ={oper_freq}\r\n',
+                    f'FOCUS={focus}\r\n',
+                    f'GLOBALPOWER={global_power}\r\n']
+        self.sendCommands(commands)
+
     def setGlobalPower(self, global_power):
         command = f'GLOBALPOWER={global_power}\r\n'
         self.sendCommand(command, 0.1)